@@ -0,0 +1,126 @@
+"""
+Grouped SQL aggregates behind the /analytics dashboard.
+
+Every figure is computed in the database and only scalar rows come back, so
+the cost of a dashboard view no longer grows with the number of Task objects
+loaded into Python. Date/weekday/hour extraction differs between MySQL and
+SQLite, so the few dialect-specific expressions live in the helpers below.
+"""
+from sqlalchemy import func, case, cast, and_, Integer, literal_column
+from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
+import models
+
+def day_expr(column):
+    return func.date(column)
+
+def weekday_expr(column, dialect: str):
+    # Monday = 0 ... Sunday = 6, matching datetime.weekday()
+    if dialect == "sqlite":
+        return (cast(func.strftime('%w', column), Integer) + 6) % 7
+    return func.weekday(column)
+
+def hour_expr(column, dialect: str):
+    if dialect == "sqlite":
+        return cast(func.strftime('%H', column), Integer)
+    return func.hour(column)
+
+def duration_hours_expr(start_col, end_col, dialect: str):
+    if dialect == "sqlite":
+        return (func.julianday(end_col) - func.julianday(start_col)) * 24.0
+    return func.timestampdiff(literal_column("MICROSECOND"), start_col, end_col) / 3600000000.0
+
+def count_where(condition):
+    return func.sum(case((condition, 1), else_=0))
+
+def as_int(value):
+    return int(value) if value is not None else 0
+
+def as_float(value):
+    return float(value) if value is not None else 0.0
+
+def compute_task_metrics(db_session: Session, user_id: int, current_time: datetime = None, full_history: bool = False):
+    """Return the raw dashboard figures for a user using grouped SQL aggregates.
+
+    Daily created/completed counts cover the 7-day trend window, or every day
+    when ``full_history`` is set (used to rebuild the analytics rollup).
+    """
+    current_time = current_time or datetime.now()
+    dialect = db_session.get_bind().dialect.name
+    Task = models.Task
+    hour_of_completion = hour_expr(Task.completed_at, dialect)
+    duration_hours = duration_hours_expr(Task.started_at, Task.completed_at, dialect)
+    has_duration = and_(Task.completed_at.isnot(None), Task.started_at.isnot(None))
+
+    summary = db_session.query(
+        func.count(Task.id),
+        count_where(Task.status == 'completed'),
+        count_where(Task.status == 'in_progress'),
+        count_where(Task.status == 'pending'),
+        count_where(Task.priority == 'low'),
+        count_where(Task.priority == 'medium'),
+        count_where(Task.priority == 'high'),
+        count_where(and_(Task.due_date.isnot(None), Task.due_date < current_time, Task.status != 'completed')),
+        count_where(has_duration),
+        func.sum(case((has_duration, duration_hours))),
+        func.min(case((has_duration, duration_hours))),
+        func.max(case((has_duration, duration_hours))),
+        count_where(and_(Task.completed_at.isnot(None), hour_of_completion >= 6, hour_of_completion < 12)),
+        count_where(and_(Task.completed_at.isnot(None), hour_of_completion >= 12, hour_of_completion < 18)),
+        count_where(and_(Task.completed_at.isnot(None), hour_of_completion >= 18, hour_of_completion < 22)),
+        count_where(and_(Task.completed_at.isnot(None), (hour_of_completion < 6) | (hour_of_completion >= 22))),
+    ).filter(Task.user_id == user_id).one()
+
+    (total, completed, in_progress, pending, low, medium, high, overdue,
+     duration_count, duration_sum, min_duration, max_duration, morning, afternoon, evening, night) = summary
+
+    metrics = {
+        "total": as_int(total),
+        "completed": as_int(completed),
+        "in_progress": as_int(in_progress),
+        "pending": as_int(pending),
+        "priorities": {"low": as_int(low), "medium": as_int(medium), "high": as_int(high)},
+        "overdue": as_int(overdue),
+        "duration_count": as_int(duration_count),
+        "duration_sum": as_float(duration_sum),
+        "mean_duration": as_float(duration_sum) / as_int(duration_count) if duration_count else 0.0,
+        "min_duration": as_float(min_duration),
+        "max_duration": as_float(max_duration),
+        "time_slots": {
+            "morning": as_int(morning),
+            "afternoon": as_int(afternoon),
+            "evening": as_int(evening),
+            "night": as_int(night),
+        },
+    }
+    if metrics["total"] == 0:
+        return metrics
+
+    weekday_of_completion = weekday_expr(Task.completed_at, dialect)
+    weekday_rows = db_session.query(weekday_of_completion, func.count(Task.id)).filter(
+        Task.user_id == user_id, Task.completed_at.isnot(None)
+    ).group_by(weekday_of_completion).all()
+    metrics["weekday_completed"] = {int(day_idx): as_int(count) for day_idx, count in weekday_rows}
+
+    window_start = (current_time - timedelta(days=6)).replace(hour=0, minute=0, second=0, microsecond=0)
+    window_end = current_time.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+
+    created_day = day_expr(Task.created_at)
+    created_query = db_session.query(created_day, func.count(Task.id)).filter(
+        Task.user_id == user_id, Task.created_at.isnot(None)
+    )
+    completed_day = day_expr(Task.completed_at)
+    completed_query = db_session.query(completed_day, func.count(Task.id)).filter(
+        Task.user_id == user_id, Task.completed_at.isnot(None)
+    )
+    if not full_history:
+        created_query = created_query.filter(Task.created_at >= window_start, Task.created_at < window_end)
+        completed_query = completed_query.filter(Task.completed_at >= window_start, Task.completed_at < window_end)
+
+    created_rows = created_query.group_by(created_day).all()
+    completed_rows = completed_query.group_by(completed_day).all()
+
+    # DATE() comes back as a date on MySQL and as 'YYYY-MM-DD' text on SQLite
+    metrics["daily_created"] = {str(day)[:10]: as_int(count) for day, count in created_rows}
+    metrics["daily_completed"] = {str(day)[:10]: as_int(count) for day, count in completed_rows}
+    return metrics
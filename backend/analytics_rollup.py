@@ -0,0 +1,408 @@
+"""
+Incrementally maintained analytics rollup.
+
+Task writes call apply_task_change() inside their own transaction, so the
+per-user totals in user_task_stats and the per-day counts in
+user_daily_task_stats always move together with the tasks table. The
+dashboard then reads one stats row plus the seven trend days instead of
+aggregating the user's whole history.
+
+Rebuild or verify the rollup from the command line:
+    python analytics_rollup.py rebuild [--user-id ID]
+    python analytics_rollup.py check [--user-id ID]
+"""
+from sqlalchemy import func, case, and_
+from sqlalchemy.dialects import mysql, sqlite
+from sqlalchemy.orm import Session
+from collections import defaultdict
+from datetime import datetime, date, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import argparse
+import sys
+import models, analytics_queries
+
+WEEKDAY_COLUMNS = [
+    "completed_mon", "completed_tue", "completed_wed", "completed_thu",
+    "completed_fri", "completed_sat", "completed_sun",
+]
+STATUS_COLUMNS = {
+    "completed": "completed_tasks",
+    "in_progress": "in_progress_tasks",
+    "pending": "pending_tasks",
+}
+PRIORITY_COLUMNS = {
+    "low": "low_priority_tasks",
+    "medium": "medium_priority_tasks",
+    "high": "high_priority_tasks",
+}
+# Durations are floats; differences below this are treated as equal
+DURATION_TOLERANCE_HOURS = 1e-4
+
+def time_slot_column(hour: int) -> str:
+    if 6 <= hour < 12:
+        return "completed_morning"
+    elif 12 <= hour < 18:
+        return "completed_afternoon"
+    elif 18 <= hour < 22:
+        return "completed_evening"
+    return "completed_night"
+
+def upsert_statement(db_session: Session, model, updates: Dict[str, Callable]):
+    """
+    INSERT that updates the existing row on a primary key clash, so concurrent
+    writers never race a check-then-insert into a duplicate key. ``updates``
+    maps column names to a function of the proposed row (``excluded`` on
+    SQLite, ``inserted`` on MySQL) returning the column's new value.
+    """
+    if db_session.get_bind().dialect.name == "mysql":
+        statement = mysql.insert(model)
+        return statement.on_duplicate_key_update({column: value(statement.inserted) for column, value in updates.items()})
+    statement = sqlite.insert(model)
+    return statement.on_conflict_do_update(
+        index_elements=[column.name for column in model.__table__.primary_key],
+        set_={column: value(statement.excluded) for column, value in updates.items()}
+    )
+
+def snapshot_task(task: models.Task) -> Dict[str, Any]:
+    """Capture the task fields the rollup depends on, before or after a write."""
+    return {
+        "status": task.status,
+        "priority": task.priority,
+        "created_at": task.created_at,
+        "started_at": task.started_at,
+        "completed_at": task.completed_at,
+    }
+
+def task_duration_hours(task_state: Dict[str, Any]) -> Optional[float]:
+    if task_state["completed_at"] and task_state["started_at"]:
+        return (task_state["completed_at"] - task_state["started_at"]).total_seconds() / 3600
+    return None
+
+def task_contribution(task_state: Dict[str, Any]):
+    counters = {"total_tasks": 1}
+    if task_state["status"] in STATUS_COLUMNS:
+        counters[STATUS_COLUMNS[task_state["status"]]] = 1
+    if task_state["priority"] in PRIORITY_COLUMNS:
+        counters[PRIORITY_COLUMNS[task_state["priority"]]] = 1
+
+    completed_at = task_state["completed_at"]
+    if completed_at:
+        counters[WEEKDAY_COLUMNS[completed_at.weekday()]] = 1
+        counters[time_slot_column(completed_at.hour)] = 1
+
+    duration = task_duration_hours(task_state)
+    if duration is not None:
+        counters["duration_count"] = 1
+        counters["duration_sum_hours"] = duration
+
+    daily = defaultdict(int)
+    if task_state["created_at"]:
+        daily[(task_state["created_at"].date(), "created_count")] += 1
+    if completed_at:
+        daily[(completed_at.date(), "completed_count")] += 1
+    return counters, daily, duration
+
+def apply_task_change(db_session: Session, user_id: int, before: Optional[Dict[str, Any]], after: Optional[Dict[str, Any]]):
+    """Fold one task write into the rollup. ``before``/``after`` are snapshots, None for create/delete."""
+    apply_task_changes(db_session, user_id, [(before, after)])
+
+def apply_task_changes(db_session: Session, user_id: int, changes: List[Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]]):
+    """Fold a batch of ``(before, after)`` task writes into the rollup with one set of UPDATEs."""
+    db_session.flush()
+    counter_delta = defaultdict(float)
+    daily_delta = defaultdict(int)
+    added_durations = []
+    removed_durations = []
+
+    for before, after in changes:
+        removed_duration = added_duration = None
+        if before is not None:
+            counters, daily, removed_duration = task_contribution(before)
+            for column, val in counters.items():
+                counter_delta[column] -= val
+            for key, val in daily.items():
+                daily_delta[key] -= val
+
+        if after is not None:
+            counters, daily, added_duration = task_contribution(after)
+            for column, val in counters.items():
+                counter_delta[column] += val
+            for key, val in daily.items():
+                daily_delta[key] += val
+
+        if removed_duration != added_duration:
+            if added_duration is not None:
+                added_durations.append(added_duration)
+            if removed_duration is not None:
+                removed_durations.append(removed_duration)
+
+    Stats = models.UserTaskStats
+    stats_query = db_session.query(Stats).filter(Stats.user_id == user_id)
+
+    # change_version moves on every write, so this UPDATE always runs, even when no counter changed
+    changed_counters = {Stats.change_version: Stats.change_version + 1}
+    changed_counters.update({
+        getattr(Stats, column): getattr(Stats, column) + (int(val) if column != "duration_sum_hours" else val)
+        for column, val in counter_delta.items() if val
+    })
+    # The UPDATE doubles as the existence check: no row matched means the rollup was never seeded
+    if not stats_query.update(changed_counters, synchronize_session=False):
+        # First write since the rollup was introduced: seed it from the (already flushed) tasks
+        rebuild_user_rollup(db_session, user_id)
+        return
+
+    if added_durations:
+        lowest_added, highest_added = min(added_durations), max(added_durations)
+        stats_query.update({
+            Stats.duration_min_hours: case(
+                (Stats.duration_min_hours.is_(None) | (Stats.duration_min_hours > lowest_added), lowest_added),
+                else_=Stats.duration_min_hours
+            ),
+            Stats.duration_max_hours: case(
+                (Stats.duration_max_hours.is_(None) | (Stats.duration_max_hours < highest_added), highest_added),
+                else_=Stats.duration_max_hours
+            ),
+        }, synchronize_session=False)
+    if removed_durations:
+        current_min, current_max = db_session.query(Stats.duration_min_hours, Stats.duration_max_hours).filter(
+            Stats.user_id == user_id
+        ).first() or (None, None)
+        # Only a removed extreme forces a rescan of the user's durations
+        if (current_min is None or min(removed_durations) <= current_min + DURATION_TOLERANCE_HOURS
+                or current_max is None or max(removed_durations) >= current_max - DURATION_TOLERANCE_HOURS):
+            refresh_duration_extremes(db_session, user_id)
+
+    Daily = models.UserDailyTaskStats
+    day_rows = defaultdict(lambda: {"created_count": 0, "completed_count": 0})
+    for (day, column), val in daily_delta.items():
+        if val:
+            day_rows[day][column] += val
+    if day_rows:
+        db_session.execute(
+            upsert_statement(db_session, Daily, {
+                "created_count": lambda new_row: Daily.created_count + new_row.created_count,
+                "completed_count": lambda new_row: Daily.completed_count + new_row.completed_count,
+            }),
+            [{"user_id": user_id, "day": day, **counts} for day, counts in day_rows.items()]
+        )
+
+def refresh_duration_extremes(db_session: Session, user_id: int):
+    dialect = db_session.get_bind().dialect.name
+    Task = models.Task
+    duration_hours = analytics_queries.duration_hours_expr(Task.started_at, Task.completed_at, dialect)
+    has_duration = and_(Task.completed_at.isnot(None), Task.started_at.isnot(None))
+    min_duration, max_duration = db_session.query(
+        func.min(case((has_duration, duration_hours))),
+        func.max(case((has_duration, duration_hours))),
+    ).filter(Task.user_id == user_id).one()
+    db_session.query(models.UserTaskStats).filter(models.UserTaskStats.user_id == user_id).update({
+        models.UserTaskStats.duration_min_hours: min_duration,
+        models.UserTaskStats.duration_max_hours: max_duration,
+    }, synchronize_session=False)
+
+def rebuild_user_rollup(db_session: Session, user_id: int):
+    """Recompute a user's rollup rows from the tasks table (does not commit)."""
+    db_session.flush()
+    metrics = analytics_queries.compute_task_metrics(db_session, user_id, full_history=True)
+
+    db_session.query(models.UserDailyTaskStats).filter(models.UserDailyTaskStats.user_id == user_id).delete()
+
+    weekday_counts = metrics.get("weekday_completed", {})
+    has_durations = metrics["duration_count"] > 0
+    Stats = models.UserTaskStats
+    stats_values = {
+        "total_tasks": metrics["total"],
+        "completed_tasks": metrics["completed"],
+        "in_progress_tasks": metrics["in_progress"],
+        "pending_tasks": metrics["pending"],
+        "low_priority_tasks": metrics["priorities"]["low"],
+        "medium_priority_tasks": metrics["priorities"]["medium"],
+        "high_priority_tasks": metrics["priorities"]["high"],
+        "duration_count": metrics["duration_count"],
+        "duration_sum_hours": metrics["duration_sum"],
+        "duration_min_hours": metrics["min_duration"] if has_durations else None,
+        "duration_max_hours": metrics["max_duration"] if has_durations else None,
+        "completed_morning": metrics["time_slots"]["morning"],
+        "completed_afternoon": metrics["time_slots"]["afternoon"],
+        "completed_evening": metrics["time_slots"]["evening"],
+        "completed_night": metrics["time_slots"]["night"],
+        "updated_at": datetime.utcnow(),
+        **{column: weekday_counts.get(day_idx, 0) for day_idx, column in enumerate(WEEKDAY_COLUMNS)}
+    }
+    # A rebuild may change what readers see, so an existing row also bumps change_version to invalidate their ETags
+    stats_updates = {column: (lambda new_row, column=column: getattr(new_row, column)) for column in stats_values}
+    stats_updates["change_version"] = lambda new_row: Stats.change_version + 1
+    db_session.execute(
+        upsert_statement(db_session, Stats, stats_updates),
+        {"user_id": user_id, "change_version": 1, **stats_values}
+    )
+
+    daily_created = metrics.get("daily_created", {})
+    daily_completed = metrics.get("daily_completed", {})
+    day_rows = [
+        {
+            "user_id": user_id,
+            "day": date.fromisoformat(day_key),
+            "created_count": daily_created.get(day_key, 0),
+            "completed_count": daily_completed.get(day_key, 0),
+        }
+        for day_key in set(daily_created) | set(daily_completed)
+    ]
+    if day_rows:
+        Daily = models.UserDailyTaskStats
+        # Upserted rather than added: a concurrent rebuild may have inserted the same days since the DELETE above
+        db_session.execute(upsert_statement(db_session, Daily, {
+            "created_count": lambda new_row: new_row.created_count,
+            "completed_count": lambda new_row: new_row.completed_count,
+        }), day_rows)
+
+def load_dashboard_metrics(db_session: Session, user_id: int, current_time: datetime = None):
+    """Read the dashboard figures from the rollup, in the shape of compute_task_metrics()."""
+    current_time = current_time or datetime.now()
+    stats = db_session.query(models.UserTaskStats).filter(models.UserTaskStats.user_id == user_id).first()
+    if stats is None:
+        # Not backfilled yet: answer from the live aggregates without writing on a read
+        return analytics_queries.compute_task_metrics(db_session, user_id, current_time)
+
+    # Overdue depends on the clock rather than on writes, so it stays a live count
+    Task = models.Task
+    overdue = db_session.query(func.count(Task.id)).filter(
+        Task.user_id == user_id,
+        Task.due_date.isnot(None),
+        Task.due_date < current_time,
+        Task.status != 'completed'
+    ).scalar()
+
+    window_start = (current_time - timedelta(days=6)).date()
+    trend_rows = db_session.query(models.UserDailyTaskStats).filter(
+        models.UserDailyTaskStats.user_id == user_id,
+        models.UserDailyTaskStats.day >= window_start,
+        models.UserDailyTaskStats.day <= current_time.date()
+    ).all()
+
+    return {
+        "total": stats.total_tasks,
+        "completed": stats.completed_tasks,
+        "in_progress": stats.in_progress_tasks,
+        "pending": stats.pending_tasks,
+        "priorities": {
+            "low": stats.low_priority_tasks,
+            "medium": stats.medium_priority_tasks,
+            "high": stats.high_priority_tasks,
+        },
+        "overdue": overdue or 0,
+        "duration_count": stats.duration_count,
+        "duration_sum": stats.duration_sum_hours,
+        "mean_duration": stats.duration_sum_hours / stats.duration_count if stats.duration_count else 0.0,
+        "min_duration": stats.duration_min_hours or 0.0,
+        "max_duration": stats.duration_max_hours or 0.0,
+        "time_slots": {
+            "morning": stats.completed_morning,
+            "afternoon": stats.completed_afternoon,
+            "evening": stats.completed_evening,
+            "night": stats.completed_night,
+        },
+        "weekday_completed": {day_idx: getattr(stats, column) for day_idx, column in enumerate(WEEKDAY_COLUMNS)},
+        "daily_created": {row.day.isoformat(): row.created_count for row in trend_rows},
+        "daily_completed": {row.day.isoformat(): row.completed_count for row in trend_rows},
+    }
+
+def check_user_rollup(db_session: Session, user_id: int) -> List[str]:
+    """Compare a user's rollup with freshly aggregated figures and describe any drift."""
+    expected = analytics_queries.compute_task_metrics(db_session, user_id, full_history=True)
+    stats = db_session.query(models.UserTaskStats).filter(models.UserTaskStats.user_id == user_id).first()
+    if stats is None:
+        return [f"user {user_id}: rollup row missing"] if expected["total"] else []
+
+    problems = []
+    weekday_counts = expected.get("weekday_completed", {})
+    expected_counters = {
+        "total_tasks": expected["total"],
+        "completed_tasks": expected["completed"],
+        "in_progress_tasks": expected["in_progress"],
+        "pending_tasks": expected["pending"],
+        "low_priority_tasks": expected["priorities"]["low"],
+        "medium_priority_tasks": expected["priorities"]["medium"],
+        "high_priority_tasks": expected["priorities"]["high"],
+        "duration_count": expected["duration_count"],
+        "completed_morning": expected["time_slots"]["morning"],
+        "completed_afternoon": expected["time_slots"]["afternoon"],
+        "completed_evening": expected["time_slots"]["evening"],
+        "completed_night": expected["time_slots"]["night"],
+    }
+    for day_idx, column in enumerate(WEEKDAY_COLUMNS):
+        expected_counters[column] = weekday_counts.get(day_idx, 0)
+    for column, expected_val in expected_counters.items():
+        stored_val = getattr(stats, column)
+        if stored_val != expected_val:
+            problems.append(f"user {user_id}: {column} is {stored_val}, expected {expected_val}")
+
+    has_durations = expected["duration_count"] > 0
+    expected_durations = {
+        "duration_sum_hours": expected["duration_sum"],
+        "duration_min_hours": expected["min_duration"] if has_durations else None,
+        "duration_max_hours": expected["max_duration"] if has_durations else None,
+    }
+    for column, expected_val in expected_durations.items():
+        stored_val = getattr(stats, column)
+        if (stored_val is None) != (expected_val is None) or (
+                stored_val is not None and abs(stored_val - expected_val) > DURATION_TOLERANCE_HOURS):
+            problems.append(f"user {user_id}: {column} is {stored_val}, expected {expected_val}")
+
+    stored_days = {
+        row.day.isoformat(): (row.created_count, row.completed_count)
+        for row in db_session.query(models.UserDailyTaskStats).filter(models.UserDailyTaskStats.user_id == user_id)
+        if row.created_count or row.completed_count
+    }
+    daily_created = expected.get("daily_created", {})
+    daily_completed = expected.get("daily_completed", {})
+    expected_days = {
+        day_key: (daily_created.get(day_key, 0), daily_completed.get(day_key, 0))
+        for day_key in set(daily_created) | set(daily_completed)
+    }
+    for day_key in sorted(set(stored_days) | set(expected_days)):
+        if stored_days.get(day_key, (0, 0)) != expected_days.get(day_key, (0, 0)):
+            problems.append(
+                f"user {user_id}: day {day_key} is {stored_days.get(day_key, (0, 0))}, "
+                f"expected {expected_days.get(day_key, (0, 0))} (created, completed)"
+            )
+    return problems
+
+def run_cli(argv=None):
+    from database import LocalSession, db_engine, Base
+
+    parser = argparse.ArgumentParser(description="Rebuild or verify the analytics rollup tables")
+    parser.add_argument("command", choices=["rebuild", "check"])
+    parser.add_argument("--user-id", type=int, help="Limit to a single user (default: all users)")
+    args = parser.parse_args(argv)
+
+    Base.metadata.create_all(bind=db_engine)
+    db_session = LocalSession()
+    try:
+        if args.user_id is not None:
+            user_ids = [args.user_id]
+        else:
+            user_ids = [user_id for (user_id,) in db_session.query(models.User.id).order_by(models.User.id)]
+
+        if args.command == "rebuild":
+            for user_id in user_ids:
+                rebuild_user_rollup(db_session, user_id)
+                db_session.commit()
+            print(f"✓ Rebuilt analytics rollup for {len(user_ids)} user(s)")
+            return 0
+
+        problems = []
+        for user_id in user_ids:
+            problems.extend(check_user_rollup(db_session, user_id))
+        for problem in problems:
+            print(f"✗ {problem}")
+        if problems:
+            print(f"\n❌ Rollup drift found in {len(problems)} place(s). Run `python analytics_rollup.py rebuild` to repair.")
+            return 1
+        print(f"✓ Analytics rollup consistent for {len(user_ids)} user(s)")
+        return 0
+    finally:
+        db_session.close()
+
+if __name__ == "__main__":
+    sys.exit(run_cli())
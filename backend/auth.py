@@ -4,10 +4,13 @@ from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
 import schemas, database, models
+from user_cache import user_cache, snapshot_user
 import os
-import bcrypt
+import password_hashing
 
 from dotenv import load_dotenv
 
@@ -22,10 +25,32 @@ TOKEN_EXPIRE_MINUTES = 30
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
 def verify_passwd(plain, hashed):
-    return bcrypt.checkpw(plain.encode('utf-8'), hashed.encode('utf-8'))
+    return password_hashing.verify_password_sync(plain, hashed)
 
 def hash_passwd(password):
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    return password_hashing.hash_password_sync(password)
+
+def password_pool_busy_exception():
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Authentication service is busy, please retry shortly",
+        headers={"Retry-After": "1"},
+    )
+
+async def verify_passwd_async(plain, hashed):
+    try:
+        return await password_hashing.verify_password(plain, hashed)
+    except password_hashing.PasswordPoolBusy:
+        raise password_pool_busy_exception()
+
+async def hash_passwd_async(password):
+    try:
+        return await password_hashing.hash_password(password)
+    except password_hashing.PasswordPoolBusy:
+        raise password_pool_busy_exception()
+
+def passwd_needs_rehash(hashed):
+    return password_hashing.hash_needs_rehash(hashed)
 
 def generate_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encode_data = data.copy()
@@ -37,22 +62,52 @@ def generate_access_token(data: dict, expires_delta: Optional[timedelta] = None)
     jwt_token = jwt.encode(encode_data, SECRET_KEY_VAL, algorithm=JWT_ALGO)
     return jwt_token
 
-def retrieve_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(database.get_database_session)):
+def decode_access_token(token: str) -> Optional[dict]:
+    try:
+        return jwt.decode(token, SECRET_KEY_VAL, algorithms=[JWT_ALGO])
+    except JWTError:
+        return None
+
+def decode_token_subject(token: str) -> Optional[str]:
+    decoded = decode_access_token(token)
+    return decoded.get("sub") if decoded else None
+
+def user_by_username(username: str):
+    return select(models.User).where(models.User.username == username)
+
+async def retrieve_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(database.get_async_database_session)):
+    return await load_token_user(token, db)
+
+async def load_token_user(token: str, db: AsyncSession):
+    """Resolve a bearer token to its user through the identity cache, else with one SELECT on ``db``."""
     cred_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        decoded = jwt.decode(token, SECRET_KEY_VAL, algorithms=[JWT_ALGO])
-        username: str = decoded.get("sub")
-        if username is None:
-            raise cred_exception
-        token_data = schemas.TokenData(username=username)
-    except JWTError:
+    decoded = decode_access_token(token)
+    username = decoded.get("sub") if decoded else None
+    if username is None:
         raise cred_exception
+    token_data = schemas.TokenData(username=username)
     
-    user_record = db.query(models.User).filter(models.User.username == token_data.username).first()
+    cached_user = user_cache.get(token_data.username)
+    if cached_user is not None:
+        # Attach the cached row to this session without a SELECT so routes can still modify it
+        cached_record = models.User(**cached_user)
+        make_transient_to_detached(cached_record)
+        return await db.merge(cached_record, load=False)
+    
+    user_record = (await db.execute(user_by_username(token_data.username))).scalars().first()
     if user_record is None:
         raise cred_exception
+    user_cache.put(token_data.username, snapshot_user(user_record), token_expires_at=decoded.get("exp"))
     return user_record
+
+async def retrieve_socket_user(token: Optional[str]):
+    """Resolve a WebSocket token to its user with a short-lived session, or None if invalid."""
+    username = decode_token_subject(token) if token else None
+    if username is None:
+        return None
+    async with database.AsyncLocalSession() as db:
+        return (await db.execute(user_by_username(username))).scalars().first()
@@ -0,0 +1,124 @@
+"""
+Avatar normalization on a dedicated process pool, and cache-friendly serving.
+
+Uploads are decoded (the real format is sniffed from the bytes, never from
+the client's filename), EXIF-rotated, center-cropped to a square and
+re-encoded to WebP at each size in AVATAR_SIZES. Decoding and resampling
+are CPU-bound, so they run in worker processes like password hashing.
+
+Variant filenames carry a digest of the upload and the render settings, so
+a URL never changes content: UploadStaticFiles serves them as immutable
+with a strong ETag, and a new avatar always gets new URLs.
+"""
+from pathlib import Path
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from typing import Dict, List, Optional
+from worker_pool import BoundedProcessPool, WorkerPoolBusy
+import hashlib
+import os
+import re
+
+AVATAR_SIZES = [int(size) for size in os.getenv("AVATAR_SIZES", "64,160,320").split(",")]
+AVATAR_WEBP_QUALITY = int(os.getenv("AVATAR_WEBP_QUALITY", "80"))
+AVATAR_MAX_PIXELS = int(os.getenv("AVATAR_MAX_PIXELS", str(40_000_000)))
+AVATAR_POOL_WORKERS = int(os.getenv("AVATAR_POOL_WORKERS", "2"))
+AVATAR_POOL_MAX_PENDING = int(os.getenv("AVATAR_POOL_MAX_PENDING", "16"))
+
+# Bump when the rendering code changes output for the same input, so old URLs are not reused
+AVATAR_RENDER_VERSION = 1
+
+ACCEPTED_FORMATS = {"JPEG", "PNG", "WEBP"}
+AVATAR_URL_PREFIX = "/uploads/avatars/"
+VARIANT_NAME_PATTERN = re.compile(r"^(?P<stem>.+)_(?P<size>\d+)\.webp$")
+CONTENT_ADDRESSED_PATTERN = re.compile(r"_(?P<digest>[0-9a-f]{16})_(?P<size>\d+)\.webp$")
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+class InvalidAvatarImage(Exception):
+    pass
+
+class AvatarPoolBusy(WorkerPoolBusy):
+    pass
+
+def variant_name(stem: str, size: int) -> str:
+    return f"{stem}_{size}.webp"
+
+def variant_urls(avatar_url: Optional[str]) -> Dict[str, str]:
+    """Map each size to its URL, given the URL of any one variant; empty for legacy avatars."""
+    if not avatar_url or not avatar_url.startswith(AVATAR_URL_PREFIX):
+        return {}
+    match = VARIANT_NAME_PATTERN.match(avatar_url[len(AVATAR_URL_PREFIX):])
+    if not match:
+        return {}
+    return {str(size): AVATAR_URL_PREFIX + variant_name(match.group("stem"), size) for size in AVATAR_SIZES}
+
+def stale_avatar_files(previous_avatar_url: Optional[str], user_stem: str) -> List[str]:
+    """Filenames in the avatar directory that belonged to ``user_stem``'s previous avatar."""
+    if not previous_avatar_url or not previous_avatar_url.startswith(AVATAR_URL_PREFIX):
+        return []
+    urls = list(variant_urls(previous_avatar_url).values()) or [previous_avatar_url]
+    filenames = [Path(url).name for url in urls]
+    # avatar_url is user-editable; only ever delete files named after this user
+    return [name for name in filenames if name.startswith(f"{user_stem}_") or Path(name).stem == user_stem]
+
+def avatar_digest(source_path: str) -> str:
+    digest = hashlib.sha256(f"{AVATAR_RENDER_VERSION}:{AVATAR_WEBP_QUALITY}:{sorted(AVATAR_SIZES)}:".encode("utf-8"))
+    with open(source_path, "rb") as source_file:
+        for block in iter(lambda: source_file.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()[:16]
+
+def render_avatar_variants(source_path: str, dest_dir: str, user_stem: str) -> Dict[int, str]:
+    """Decode the upload and write one square WebP per size. Runs in a pool worker."""
+    # Imported here so the server process does not pay for Pillow's plugins
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    stem = f"{user_stem}_{avatar_digest(source_path)}"
+
+    Image.MAX_IMAGE_PIXELS = AVATAR_MAX_PIXELS
+    try:
+        with Image.open(source_path) as source_image:
+            if source_image.format not in ACCEPTED_FORMATS:
+                raise InvalidAvatarImage(f"Unsupported image format: {source_image.format}")
+            source_image.load()
+            normalized = ImageOps.exif_transpose(source_image)
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as e:
+        raise InvalidAvatarImage(f"Could not decode image: {e}")
+
+    normalized = normalized.convert("RGBA" if "A" in normalized.getbands() else "RGB")
+    written = {}
+    for size in sorted(AVATAR_SIZES, reverse=True):
+        variant = ImageOps.fit(normalized, (size, size), method=Image.Resampling.LANCZOS)
+        target = Path(dest_dir) / variant_name(stem, size)
+        # Write then rename so a concurrent reader never sees a half-written file
+        partial = target.with_suffix(".webp.partial")
+        variant.save(partial, format="WEBP", quality=AVATAR_WEBP_QUALITY, method=4)
+        os.replace(partial, target)
+        written[size] = target.name
+    return written
+
+avatar_pool = BoundedProcessPool("avatar", AVATAR_POOL_WORKERS, AVATAR_POOL_MAX_PENDING, AvatarPoolBusy)
+
+async def render_avatar(source_path: str, dest_dir: str, user_stem: str) -> Dict[int, str]:
+    return await avatar_pool.run(render_avatar_variants, source_path, dest_dir, user_stem)
+
+class UploadStaticFiles(StaticFiles):
+    """StaticFiles that lets browsers and CDNs keep content-addressed files forever."""
+
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200):
+        match = CONTENT_ADDRESSED_PATTERN.search(os.path.basename(full_path))
+        if match:
+            headers = {
+                "cache-control": IMMUTABLE_CACHE_CONTROL,
+                # The digest identifies the bytes, unlike the default mtime/size ETag
+                "etag": f'"{match.group("digest")}-{match.group("size")}"',
+            }
+        else:
+            # Fixed-name files (legacy avatars) can change in place: always revalidate
+            headers = {"cache-control": "no-cache"}
+
+        response = FileResponse(full_path, status_code=status_code, stat_result=stat_result, headers=headers)
+        if self.is_not_modified(response.headers, Headers(scope=scope)):
+            return NotModifiedResponse(response.headers)
+        return response
@@ -0,0 +1,430 @@
+"""
+End-to-end load benchmark of the API hot paths, run in-process.
+
+Seeds a scratch database (a temporary SQLite file unless --database-url
+points at an empty SQLite or MySQL database) with --users users and --tasks
+tasks, then drives the real app through httpx.ASGITransport:
+
+  login          POST /auth/login (bcrypt dominates; see BCRYPT_ROUNDS)
+  tasks_list     GET /tasks/
+  task_create    POST /tasks/
+  task_update    PUT /tasks/{id}
+  task_delete    DELETE /tasks/{id}
+  analytics      GET /analytics/
+  ws_connect     opening --websockets concurrent /ws/{client_id} sockets
+  ws_fanout      POST /tasks/ while those sockets are open; latency is until
+                 the task_update event reaches the owner's socket
+
+OpenRouter is served by fake_openrouter.app in-process, so the background
+AI insights refresh costs what it would against a fast upstream.
+
+For each scenario it reports throughput, p50/p95/p99 latency, SQL statements
+per request (every statement on every engine while the scenario runs,
+divided by its requests) and peak RSS. --save-baseline writes the results
+as JSON; --baseline compares against such a file and exits with status 1
+when a scenario got slower, issued more statements or failed more often.
+Compare on the same machine and workload: timings are not portable.
+
+Usage (from backend/):
+    python -m benchmarks.load --users 1000 --tasks 10000 --save-baseline bench.json
+    python -m benchmarks.load --users 1000 --tasks 10000 --baseline bench.json
+"""
+from datetime import datetime, timedelta
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.responses import WORDS
+
+BENCH_PASSWORD = "bench-Passw0rd"
+BENCH_HOST = "http://bench"
+FAKE_OPENROUTER_URL = "http://fake-openrouter/api/v1"
+WS_DELIVERY_TIMEOUT_SECONDS = 10
+QUERIES_TOLERANCE = 0.05
+# Workload settings that must match for a baseline comparison to mean anything
+WORKLOAD_KEYS = ("users", "tasks", "requests", "login_requests", "concurrency", "websockets", "seed", "dialect")
+
+def percentile(sorted_values, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux (bytes on macOS)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def task_rows(user_ids, count: int, rng: random.Random):
+    now = datetime.utcnow()
+    rows = []
+    for _ in range(count):
+        created_at = now - timedelta(minutes=rng.randint(0, 60 * 24 * 90))
+        status = rng.choice(["pending", "in_progress", "completed"])
+        words = rng.choices(WORDS, k=14)
+        rows.append({
+            "user_id": rng.choice(user_ids),
+            "title": " ".join(words[:4]).capitalize(),
+            "description": " ".join(words[4:]),
+            "status": status,
+            "priority": rng.choice(["low", "medium", "high"]),
+            "due_date": created_at + timedelta(days=rng.randint(1, 30)),
+            "started_at": created_at + timedelta(hours=1) if status != "pending" else None,
+            "completed_at": created_at + timedelta(hours=rng.randint(2, 72)) if status == "completed" else None,
+            "created_at": created_at,
+            "updated_at": created_at,
+        })
+    return rows
+
+def seed_database(user_count: int, task_count: int, rng: random.Random, batch: int = 5000):
+    """Insert users and tasks through the app's sync engine and build their analytics rollups."""
+    from sqlalchemy import func, insert, select
+    from database import Base, LocalSession, db_engine
+    from password_hashing import hash_password_sync
+    import analytics_rollup
+    import models
+
+    Base.metadata.create_all(bind=db_engine)
+    with db_engine.begin() as conn:
+        if conn.execute(select(func.count()).select_from(models.User)).scalar():
+            raise SystemExit("The benchmark database already has users; point --database-url at an empty scratch database")
+        # One bcrypt hash at the configured cost serves every user, so logins never trigger a rehash
+        hashed_password = hash_password_sync(BENCH_PASSWORD)
+        usernames = [f"bench_{index}" for index in range(user_count)]
+        for offset in range(0, user_count, batch):
+            conn.execute(insert(models.User), [
+                {"username": username, "email": f"{username}@example.com", "hashed_password": hashed_password}
+                for username in usernames[offset:offset + batch]
+            ])
+        user_ids = [user_id for (user_id,) in conn.execute(select(models.User.id).order_by(models.User.id))]
+        for offset in range(0, task_count, batch):
+            conn.execute(insert(models.Task), task_rows(user_ids, min(batch, task_count - offset), rng))
+
+    db_session = LocalSession()
+    try:
+        for user_id in user_ids:
+            analytics_rollup.rebuild_user_rollup(db_session, user_id)
+        db_session.commit()
+    finally:
+        db_session.close()
+    return list(zip(user_ids, usernames))
+
+class StatementCounter:
+    def __init__(self, engines):
+        from sqlalchemy import event
+        self.count = 0
+        for engine in engines:
+            event.listen(engine, "after_cursor_execute", self._count)
+
+    def _count(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+class AsgiWebSocket:
+    """Minimal in-process WebSocket client speaking ASGI to the app directly."""
+
+    def __init__(self, app, path: str, query_string: str):
+        self.app = app
+        self.scope = {
+            "type": "websocket", "asgi": {"version": "3.0"}, "scheme": "ws", "http_version": "1.1",
+            "path": path, "raw_path": path.encode(), "root_path": "", "query_string": query_string.encode(),
+            "headers": [(b"host", b"bench")], "client": ("127.0.0.1", 50000), "server": ("bench", 80), "subprotocols": [],
+        }
+        self.to_app = asyncio.Queue()
+        self.from_app = asyncio.Queue()
+        self.app_task = None
+
+    async def connect(self):
+        self.to_app.put_nowait({"type": "websocket.connect"})
+        self.app_task = asyncio.create_task(self.app(self.scope, self.to_app.get, self.from_app.put))
+        message = await self.from_app.get()
+        if message["type"] != "websocket.accept":
+            raise RuntimeError(f"WebSocket rejected: {message}")
+
+    async def receive_text(self) -> str:
+        while True:
+            message = await self.from_app.get()
+            if message["type"] == "websocket.send":
+                return message.get("text") or message.get("bytes", b"").decode()
+            if message["type"] == "websocket.close":
+                raise ConnectionError("WebSocket closed by the server")
+
+    async def close(self):
+        self.to_app.put_nowait({"type": "websocket.disconnect", "code": 1000})
+        await self.app_task
+
+class LoadBenchmark:
+    def __init__(self, app, engines, users, args, rng: random.Random):
+        import httpx
+        import auth as auth_utils
+        # Unhandled app errors (e.g. SQLite "database is locked") become 500s and count as errors, not crash the run
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        self.client = httpx.AsyncClient(transport=transport, base_url=BENCH_HOST, timeout=60)
+        self.app = app
+        self.statements = StatementCounter(engines)
+        self.users = users
+        self.args = args
+        self.rng = rng
+        # Tokens are minted directly so only the login scenario pays for bcrypt
+        self.headers = {
+            user_id: {"Authorization": f"Bearer {auth_utils.generate_access_token(data={'sub': username})}"}
+            for user_id, username in users
+        }
+        self.created_tasks = []
+        self.results = {}
+
+    def random_user_id(self) -> int:
+        return self.rng.choice(self.users)[0]
+
+    async def run_scenario(self, name: str, total: int, make_request):
+        latencies = []
+        errors = 0
+        request_numbers = itertools.count()
+        statements_before = self.statements.count
+        if self.args.trace_memory:
+            tracemalloc.reset_peak()
+
+        async def worker():
+            nonlocal errors
+            while (request_number := next(request_numbers)) < total:
+                started = time.perf_counter()
+                response = await make_request(request_number)
+                latencies.append(time.perf_counter() - started)
+                if response.status_code >= 400:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(min(self.args.concurrency, total))))
+        self.record(name, latencies, errors, time.perf_counter() - started, self.statements.count - statements_before)
+
+    def record(self, name: str, latencies, errors: int, elapsed: float, statements: int):
+        latencies = sorted(latencies)
+        result = {
+            "requests": len(latencies),
+            "errors": errors,
+            "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+            "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+            "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+            "queries_per_request": round(statements / len(latencies), 2) if latencies else 0.0,
+            "peak_rss_mb": round(peak_rss_mb(), 1),
+        }
+        if self.args.trace_memory:
+            result["traced_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 1)
+        self.results[name] = result
+        print_result(name, result)
+
+    async def login(self, request_number: int):
+        _, username = self.rng.choice(self.users)
+        return await self.client.post("/auth/login", data={"username": username, "password": BENCH_PASSWORD})
+
+    async def list_tasks(self, request_number: int):
+        return await self.client.get("/tasks/", headers=self.headers[self.random_user_id()])
+
+    async def create_task(self, request_number: int):
+        user_id = self.random_user_id()
+        response = await self.client.post("/tasks/", headers=self.headers[user_id], json={
+            "title": f"Bench task {request_number}", "description": " ".join(self.rng.choices(WORDS, k=10)),
+            "status": "pending", "priority": self.rng.choice(["low", "medium", "high"]),
+        })
+        if response.status_code == 200:
+            self.created_tasks.append((user_id, response.json()["id"]))
+        return response
+
+    async def update_task(self, request_number: int):
+        user_id, task_id = self.created_tasks[request_number % len(self.created_tasks)]
+        return await self.client.put(f"/tasks/{task_id}", headers=self.headers[user_id], json={
+            "status": self.rng.choice(["in_progress", "completed"]),
+        })
+
+    async def delete_task(self, request_number: int):
+        user_id, task_id = self.created_tasks[request_number]
+        return await self.client.delete(f"/tasks/{task_id}", headers=self.headers[user_id])
+
+    async def analytics(self, request_number: int):
+        return await self.client.get("/analytics/", headers=self.headers[self.random_user_id()])
+
+    async def run_websockets(self):
+        socket_users = [user_id for user_id, _ in self.users[:self.args.websockets]]
+        # More sockets than users wraps around, i.e. several tabs per user
+        socket_owners = [socket_users[index % len(socket_users)] for index in range(self.args.websockets)]
+        sockets_per_user = {user_id: socket_owners.count(user_id) for user_id in socket_users}
+        statements_before = self.statements.count
+
+        async def open_socket(index: int, user_id: int):
+            token = self.headers[user_id]["Authorization"].split(" ", 1)[1]
+            websocket = AsgiWebSocket(self.app, f"/ws/bench-{index}", f"token={token}")
+            started = time.perf_counter()
+            await websocket.connect()
+            return websocket, time.perf_counter() - started
+
+        started = time.perf_counter()
+        opened = await asyncio.gather(*(open_socket(index, user_id) for index, user_id in enumerate(socket_owners)))
+        self.record("ws_connect", [latency for _, latency in opened], 0, time.perf_counter() - started,
+                    self.statements.count - statements_before)
+
+        sent_at = {}
+        delivery_latencies = []
+
+        async def read_events(websocket):
+            while True:
+                event = json.loads(await websocket.receive_text())
+                title = event.get("task", {}).get("title") if event.get("event") == "task_update" else None
+                if title in sent_at:
+                    delivery_latencies.append(time.perf_counter() - sent_at[title])
+
+        readers = [asyncio.create_task(read_events(websocket)) for websocket, _ in opened]
+        request_numbers = itertools.count()
+        errors = 0
+        expected_deliveries = 0
+        statements_before = self.statements.count
+
+        async def publisher():
+            nonlocal errors, expected_deliveries
+            while (request_number := next(request_numbers)) < self.args.requests:
+                user_id = self.rng.choice(socket_users)
+                title = f"Bench ws {request_number}"
+                sent_at[title] = time.perf_counter()
+                response = await self.client.post("/tasks/", headers=self.headers[user_id], json={
+                    "title": title, "description": "fan-out probe", "status": "pending", "priority": "low",
+                })
+                if response.status_code >= 400:
+                    errors += 1
+                else:
+                    expected_deliveries += sockets_per_user[user_id]
+
+        started = time.perf_counter()
+        await asyncio.gather(*(publisher() for _ in range(self.args.concurrency)))
+        deadline = time.perf_counter() + WS_DELIVERY_TIMEOUT_SECONDS
+        while len(delivery_latencies) < expected_deliveries and time.perf_counter() < deadline:
+            await asyncio.sleep(0.01)
+        # Events that never arrived count as errors
+        missing = max(0, expected_deliveries - len(delivery_latencies))
+        self.record("ws_fanout", delivery_latencies, errors + missing, time.perf_counter() - started,
+                    self.statements.count - statements_before)
+
+        for reader in readers:
+            reader.cancel()
+        await asyncio.gather(*readers, return_exceptions=True)
+        await asyncio.gather(*(websocket.close() for websocket, _ in opened))
+
+    async def run(self):
+        await self.run_scenario("login", self.args.login_requests, self.login)
+        await self.run_scenario("tasks_list", self.args.requests, self.list_tasks)
+        await self.run_scenario("task_create", self.args.requests, self.create_task)
+        await self.run_scenario("task_update", self.args.requests, self.update_task)
+        await self.run_scenario("task_delete", len(self.created_tasks), self.delete_task)
+        await self.run_scenario("analytics", self.args.requests, self.analytics)
+        if self.args.websockets:
+            await self.run_websockets()
+        await self.client.aclose()
+        return self.results
+
+def print_header():
+    print(f"{'scenario':<12} {'requests':>8} {'errors':>6} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'SQL/req':>8} {'RSS MB':>7}")
+
+def print_result(name: str, result):
+    print(f"{name:<12} {result['requests']:>8} {result['errors']:>6} {result['throughput_rps']:>8} {result['p50_ms']:>8} "
+          f"{result['p95_ms']:>8} {result['p99_ms']:>8} {result['queries_per_request']:>8} {result['peak_rss_mb']:>7}")
+
+def compare_with_baseline(baseline, current, tolerance: float):
+    """Regressions of ``current`` against ``baseline`` (both as written by --save-baseline)."""
+    regressions = []
+    for name, before in baseline["scenarios"].items():
+        after = current["scenarios"].get(name)
+        if after is None:
+            regressions.append(f"{name}: scenario missing from this run")
+            continue
+        for key in ("p95_ms", "p99_ms"):
+            if after[key] > before[key] * (1 + tolerance):
+                regressions.append(f"{name}: {key} {before[key]} -> {after[key]}")
+        if after["throughput_rps"] < before["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput_rps {before['throughput_rps']} -> {after['throughput_rps']}")
+        # The average moves slightly with how concurrent requests interleave; a real N+1 moves it by whole statements
+        if after["queries_per_request"] > before["queries_per_request"] * (1 + QUERIES_TOLERANCE):
+            regressions.append(f"{name}: queries_per_request {before['queries_per_request']} -> {after['queries_per_request']}")
+        if after["errors"] > before["errors"]:
+            regressions.append(f"{name}: errors {before['errors']} -> {after['errors']}")
+    return regressions
+
+def configure_environment(args):
+    """Settings read at import time by database, auth and llm_client; must run before the app is imported."""
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ.pop("ASYNC_DATABASE_URL", None)
+    os.environ.pop("DATABASE_REPLICA_URLS", None)
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+    os.environ["OPENROUTER_BASE_URL"] = FAKE_OPENROUTER_URL
+    os.environ["OPENROUTER_API_KEY"] = "fake"
+    os.environ["EVENT_BUS_BACKEND"] = "memory"
+
+async def run_benchmark(args, users, rng):
+    import httpx
+    import fake_openrouter
+    import main
+    from llm_client import llm_client
+
+    llm_client.transport = httpx.ASGITransport(app=fake_openrouter.app)
+    async with main.app.router.lifespan_context(main.app):
+        benchmark = LoadBenchmark(main.app, main.instrumented_engines.values(), users, args, rng)
+        return await benchmark.run()
+
+def main():
+    parser = argparse.ArgumentParser(description="In-process load benchmark of the API hot paths")
+    parser.add_argument("--database-url", default=f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'load_bench.db')}",
+                        help="Empty scratch database (SQLite or MySQL); it is written to")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--tasks", type=int, default=10000, help="Tasks spread at random over the users")
+    parser.add_argument("--requests", type=int, default=500, help="Requests per scenario")
+    parser.add_argument("--login-requests", type=int, default=100, help="Logins are bcrypt-bound, so fewer by default")
+    parser.add_argument("--concurrency", type=int, default=16, help="Requests in flight at once")
+    parser.add_argument("--websockets", type=int, default=100, help="Concurrent sockets for ws_connect/ws_fanout (0 skips them)")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--trace-memory", action="store_true", help="Also report tracemalloc peaks (slows every request)")
+    parser.add_argument("--save-baseline", metavar="PATH", help="Write the results as a baseline JSON file")
+    parser.add_argument("--baseline", metavar="PATH", help="Compare against a baseline; exit 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative latency/throughput change")
+    args = parser.parse_args()
+
+    configure_environment(args)
+    rng = random.Random(args.seed)
+    started = time.perf_counter()
+    users = seed_database(args.users, args.tasks, rng)
+    print(f"Seeded {args.users} users and {args.tasks} tasks in {time.perf_counter() - started:.1f}s")
+
+    if args.trace_memory:
+        tracemalloc.start()
+    print_header()
+    scenarios = asyncio.run(run_benchmark(args, users, rng))
+
+    workload = {key: getattr(args, key, None) for key in WORKLOAD_KEYS}
+    workload["dialect"] = args.database_url.split(":", 1)[0].split("+", 1)[0]
+    current = {"workload": workload, "created_at": datetime.utcnow().isoformat(), "scenarios": scenarios}
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as baseline_file:
+            json.dump(current, baseline_file, indent=2)
+        print(f"Baseline written to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        if baseline["workload"] != workload:
+            print(f"Workload differs from the baseline ({baseline['workload']} vs {workload}); not comparing")
+            return 2
+        regressions = compare_with_baseline(baseline, current, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+        print(f"No regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+"""
+Serialization and compression cost of a large task list.
+
+Builds a /tasks/ page of synthetic tasks and measures, per response:
+  * encoding time for FastAPI's response_model fast path (pydantic-core)
+    against the path taken when a custom response class is configured
+  * size and CPU time of each compression setting on the encoded body
+
+Usage (from backend/):
+    python -m benchmarks.responses --tasks 100 --description-words 60
+"""
+from datetime import datetime, timedelta
+from pydantic import TypeAdapter
+from typing import List
+import argparse
+import gzip
+import json
+import random
+import timeit
+
+import schemas
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+WORDS = ("review order book rebalance portfolio hedge exposure check funding rate update stop loss "
+         "take profit breakout volume candle support resistance trend signal alert journal").split()
+
+def build_tasks(count: int, description_words: int, seed: int = 7) -> List[schemas.Task]:
+    rng = random.Random(seed)
+    now = datetime(2026, 1, 1, 9, 30)
+    tasks = []
+    for task_id in range(1, count + 1):
+        created_at = now - timedelta(minutes=rng.randint(0, 60 * 24 * 90))
+        status = rng.choice(["pending", "in_progress", "completed"])
+        tasks.append(schemas.Task(
+            id=task_id,
+            user_id=1,
+            title=" ".join(rng.choices(WORDS, k=rng.randint(3, 8))).capitalize(),
+            description=" ".join(rng.choices(WORDS, k=description_words)),
+            status=status,
+            priority=rng.choice(["low", "medium", "high"]),
+            due_date=created_at + timedelta(days=rng.randint(1, 30)),
+            started_at=created_at + timedelta(hours=1) if status != "pending" else None,
+            completed_at=created_at + timedelta(hours=5) if status == "completed" else None,
+            created_at=created_at,
+            updated_at=created_at + timedelta(hours=5),
+        ))
+    return tasks
+
+def time_per_call_us(fn, repeat: int = 5) -> float:
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number * 1e6
+
+def serializer_results(tasks: List[schemas.Task]):
+    adapter = TypeAdapter(List[schemas.Task])
+    serializers = [
+        # What FastAPI does for routes with a response_model and no custom response class
+        ("pydantic dump_json (default)", lambda: adapter.dump_json(tasks)),
+        # With a custom response class FastAPI hands it a JSON-safe dict, which it encodes again
+        ("JSONResponse class", lambda: json.dumps(adapter.dump_python(tasks, mode="json"), separators=(",", ":")).encode("utf-8")),
+    ]
+    if orjson is not None:
+        serializers.append(("ORJSONResponse class", lambda: orjson.dumps(adapter.dump_python(tasks, mode="json"))))
+    return [(label, time_per_call_us(fn), len(fn())) for label, fn in serializers]
+
+def compression_results(body: bytes):
+    codecs = [("identity", lambda: body)]
+    codecs += [(f"gzip level {level}", lambda level=level: gzip.compress(body, compresslevel=level)) for level in (1, 6, 9)]
+    if brotli is not None:
+        codecs += [(f"brotli quality {quality}", lambda quality=quality: brotli.compress(body, quality=quality)) for quality in (1, 4, 11)]
+    return [(label, time_per_call_us(fn), len(fn())) for label, fn in codecs]
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark /tasks/ response encoding and compression")
+    parser.add_argument("--tasks", type=int, default=100, help="Tasks per response (the /tasks/ default page is 100)")
+    parser.add_argument("--description-words", type=int, default=60)
+    args = parser.parse_args()
+
+    tasks = build_tasks(args.tasks, args.description_words)
+
+    print(f"Encoding {args.tasks} tasks")
+    for label, micros, size in serializer_results(tasks):
+        print(f"  {label:<32} {micros:>9.1f} us  {size:>8} bytes")
+
+    body = TypeAdapter(List[schemas.Task]).dump_json(tasks)
+    print(f"\nCompressing a {len(body)} byte body")
+    for label, micros, size in compression_results(body):
+        print(f"  {label:<32} {micros:>9.1f} us  {size:>8} bytes  {size / len(body):>6.1%}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Latency of /tasks/search as one user's task count grows.
+
+Seeds a scratch database (a temporary SQLite file unless --database-url is
+given) and, after each growth step, times the first result page of each
+query through task_search.search_statement, the same SELECT the endpoint
+runs. Rare words should stay flat; words found in most tasks grow with the
+number of matches to rank, as any ranked full-text search does.
+
+Usage (from backend/):
+    python -m benchmarks.search --sizes 1000,10000,100000
+"""
+from datetime import datetime, timedelta
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from benchmarks.responses import WORDS
+
+SCRATCH_URL = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'search_bench.db')}"
+# models imports database, which needs a URL even though this script uses its own engine
+os.environ.setdefault("DATABASE_URL", SCRATCH_URL)
+
+from sqlalchemy import create_engine, insert
+import models
+import task_search
+
+RARE_WORDS = ["liquidation", "arbitrage", "audit"]
+
+def task_rows(user_id: int, start: int, count: int, rng: random.Random):
+    now = datetime(2026, 1, 1)
+    rows = []
+    for index in range(start, start + count):
+        words = rng.choices(WORDS, k=12)
+        # Roughly one task in 2000 mentions each rare word
+        if rng.random() < 0.0005 * len(RARE_WORDS):
+            words.append(rng.choice(RARE_WORDS))
+        rows.append({
+            "user_id": user_id,
+            "title": " ".join(words[:4]).capitalize(),
+            "description": " ".join(words[4:]),
+            "status": rng.choice(["pending", "in_progress", "completed"]),
+            "priority": rng.choice(["low", "medium", "high"]),
+            "created_at": now - timedelta(minutes=index),
+        })
+    return rows
+
+def seed_tasks(conn, user_id: int, start: int, count: int, rng: random.Random, batch: int = 5000):
+    for offset in range(0, count, batch):
+        conn.execute(insert(models.Task), task_rows(user_id, start + offset, min(batch, count - offset), rng))
+
+def time_query(conn, user_id: int, query: str, repeat: int):
+    terms = task_search.search_terms(query)
+    statement = task_search.search_statement(conn.dialect.name, user_id, terms)
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        conn.execute(statement.limit(21)).all()
+        timings.append((time.perf_counter() - started) * 1000)
+    # Keep the ranked shape: without ORDER BY SQLite may drive the join from tasks instead of the index
+    matches = len(conn.execute(statement.with_only_columns(models.Task.id)).all())
+    return statistics.median(timings), matches
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark task full-text search against per-user task count")
+    parser.add_argument("--database-url", default=SCRATCH_URL, help="Scratch database; its tasks table is written to")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="Per-user task counts to measure at")
+    parser.add_argument("--other-users", type=int, default=4, help="Users sharing the index with 10k tasks each")
+    parser.add_argument("--queries", default="liquidation,arbit,rebal port,review", help="Comma-separated queries")
+    parser.add_argument("--repeat", type=int, default=15)
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url, connect_args={"charset": "utf8mb4"} if args.database_url.startswith("mysql") else {})
+    models.Base.metadata.create_all(bind=engine)
+    rng = random.Random(11)
+    queries = [query.strip() for query in args.queries.split(",") if query.strip()]
+
+    with engine.begin() as conn:
+        user_ids = []
+        for index in range(args.other_users + 1):
+            result = conn.execute(insert(models.User).values(
+                username=f"bench_search_{index}_{rng.randrange(10**9)}", email=f"bench_search_{index}_{rng.randrange(10**9)}@example.com",
+                hashed_password="x",
+            ))
+            user_ids.append(result.inserted_primary_key[0])
+        target_user, other_users = user_ids[0], user_ids[1:]
+        for other_user in other_users:
+            seed_tasks(conn, other_user, 0, 10000, rng)
+
+    seeded = 0
+    print(f"{'tasks':>8}  {'query':<16} {'matches':>8} {'median ms':>10}")
+    for size in sorted(int(size) for size in args.sizes.split(",")):
+        with engine.begin() as conn:
+            seed_tasks(conn, target_user, seeded, size - seeded, rng)
+            seeded = size
+        with engine.connect() as conn:
+            for query in queries:
+                median_ms, matches = time_query(conn, target_user, query, args.repeat)
+                print(f"{size:>8}  {query:<16} {matches:>8} {median_ms:>10.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Negotiated response compression (Brotli or gzip).
+
+CompressionMiddleware picks the best encoding the client accepts: Brotli
+when the optional ``brotli`` package is installed, gzip otherwise. Bodies
+under COMPRESSION_MINIMUM_BYTES, event streams, images and partial (206)
+responses are sent as-is. The levels are tuned for dynamic JSON, where
+CPU per request matters more than the last few percent of size.
+"""
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipResponder, IdentityResponder
+from typing import Dict, Optional
+import os
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSION_MINIMUM_BYTES = int(os.getenv("COMPRESSION_MINIMUM_BYTES", "1024"))
+GZIP_COMPRESSION_LEVEL = int(os.getenv("GZIP_COMPRESSION_LEVEL", "4"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+
+class BrotliResponder(IdentityResponder):
+    content_encoding = "br"
+
+    def __init__(self, app, minimum_size: int, quality: int = BROTLI_QUALITY):
+        super().__init__(app, minimum_size)
+        self.compressor = brotli.Compressor(quality=quality)
+
+    async def apply_compression(self, body: bytes, *, more_body: bool) -> bytes:
+        if more_body:
+            return self.compressor.process(body) + self.compressor.flush()
+        return self.compressor.process(body) + self.compressor.finish()
+
+def accepted_encodings(accept_encoding: str) -> Dict[str, float]:
+    """Parse an Accept-Encoding header into {coding: q}."""
+    encodings = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        if not coding:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        encodings[coding.strip().lower()] = quality
+    return encodings
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    encodings = accepted_encodings(accept_encoding)
+    wildcard = encodings.get("*", 0.0)
+    candidates = (["br"] if brotli is not None else []) + ["gzip"]
+    # Highest q wins; on a tie the earlier (smaller output) candidate is kept
+    best, best_quality = None, 0.0
+    for coding in candidates:
+        quality = encodings.get(coding, wildcard)
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = COMPRESSION_MINIMUM_BYTES,
+                 gzip_level: int = GZIP_COMPRESSION_LEVEL, brotli_quality: int = BROTLI_QUALITY):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding == "br":
+            responder = BrotliResponder(self.app, self.minimum_size, quality=self.brotli_quality)
+        elif encoding == "gzip":
+            responder = GZipResponder(self.app, self.minimum_size, compresslevel=self.gzip_level)
+        else:
+            responder = IdentityResponder(self.app, self.minimum_size)
+        await responder(scope, receive, send)
@@ -0,0 +1,45 @@
+"""
+Conditional GET for the per-user task and analytics reads.
+
+Every task write bumps user_task_stats.change_version in its own
+transaction (see analytics_rollup). Read endpoints derive a weak ETag from
+that version, so a client revalidating an unchanged view gets a 304 after
+one primary-key lookup, without the tasks table being read. Responses are
+marked ``private, no-cache``: browsers keep them but revalidate every time.
+"""
+from fastapi import Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, Optional
+import hashlib
+import json
+import os
+import models
+
+# The dashboard also depends on the clock (overdue tasks, the 7-day trend), so its ETag rolls over this often
+ANALYTICS_ETAG_WINDOW_SECONDS = int(os.getenv("ANALYTICS_ETAG_WINDOW_SECONDS", "60"))
+
+async def load_change_version(db_session: AsyncSession, user_id: int) -> Optional[int]:
+    """The user's change version; None until the rollup row exists (no ETag then)."""
+    return await db_session.scalar(
+        select(models.UserTaskStats.change_version).where(models.UserTaskStats.user_id == user_id)
+    )
+
+def weak_etag(*parts) -> str:
+    digest = hashlib.sha256(json.dumps(parts, default=str).encode("utf-8")).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of ``etag`` against an If-None-Match header."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque_tag = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque_tag for candidate in if_none_match.split(","))
+
+def cache_headers(etag: str) -> Dict[str, str]:
+    return {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Authorization"}
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers=cache_headers(etag))
@@ -1,22 +1,158 @@
 from fastapi import WebSocket
-from typing import List
+from typing import Dict, List, Any, Optional, Hashable
+from collections import OrderedDict
+import asyncio
+import itertools
+import json
+import os
+from event_bus import create_event_bus
+
+WS_QUEUE_SIZE = int(os.getenv("WS_QUEUE_SIZE", "64"))
+WS_SEND_TIMEOUT_SECONDS = float(os.getenv("WS_SEND_TIMEOUT_SECONDS", "5"))
+# coalesce: replace queued messages for the same key, then drop the oldest when full
+# drop_oldest: discard the oldest queued message when full
+# disconnect: close the socket of a client that cannot keep up
+WS_OVERFLOW_POLICY = os.getenv("WS_OVERFLOW_POLICY", "coalesce")
+
+OVERFLOW_POLICIES = ("coalesce", "drop_oldest", "disconnect")
+if WS_OVERFLOW_POLICY not in OVERFLOW_POLICIES:
+    raise ValueError(f"WS_OVERFLOW_POLICY must be one of: {', '.join(OVERFLOW_POLICIES)}")
+
+class ClientConnection:
+    """A socket with its own bounded outbox, drained by a dedicated writer task."""
+
+    _sequence = itertools.count()
+
+    def __init__(self, websocket: WebSocket, user_id: int, on_closed, max_queue: int = WS_QUEUE_SIZE, policy: str = WS_OVERFLOW_POLICY):
+        self.websocket = websocket
+        self.user_id = user_id
+        self.max_queue = max_queue
+        self.policy = policy
+        self.outbox: "OrderedDict[Hashable, str]" = OrderedDict()
+        self.dropped_messages = 0
+        self.closed = False
+        self._on_closed = on_closed
+        self._wakeup = asyncio.Event()
+        self._writer_task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._writer_task = asyncio.create_task(self._drain_outbox())
+
+    def enqueue(self, message: str, coalesce_key: Optional[Hashable] = None) -> bool:
+        if self.closed:
+            return False
+
+        if self.policy == "coalesce" and coalesce_key is not None and coalesce_key in self.outbox:
+            self.outbox[coalesce_key] = message
+            return True
+
+        if len(self.outbox) >= self.max_queue:
+            if self.policy == "disconnect":
+                self.close()
+                return False
+            self.outbox.popitem(last=False)
+            self.dropped_messages += 1
+
+        key = coalesce_key if coalesce_key is not None else ("seq", next(self._sequence))
+        self.outbox[key] = message
+        self._wakeup.set()
+        return True
+
+    async def _drain_outbox(self):
+        try:
+            while not self.closed:
+                if not self.outbox:
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+                    continue
+                _, message = self.outbox.popitem(last=False)
+                await asyncio.wait_for(self.websocket.send_text(message), WS_SEND_TIMEOUT_SECONDS)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            print(f"WebSocket Send Error (user {self.user_id}): {e}")
+        finally:
+            self._shutdown()
+
+    def close(self):
+        if self.closed:
+            return
+        if self._writer_task and not self._writer_task.done():
+            self._writer_task.cancel()
+        else:
+            self._shutdown()
+
+    def _shutdown(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.outbox.clear()
+        self._on_closed(self)
+        asyncio.ensure_future(self._close_socket())
+
+    async def _close_socket(self):
+        try:
+            await self.websocket.close()
+        except Exception:
+            pass
 
 class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
+    def __init__(self, bus=None):
+        # Sockets are indexed by the authenticated user id so task events only reach their owner
+        self.active_connections: Dict[int, List[ClientConnection]] = {}
+        # Events travel through the bus so sockets held by other workers receive them too
+        self.bus = bus or create_event_bus()
+        self.bus.subscribe(self.deliver)
 
-    async def connect(self, websocket: WebSocket):
+    async def connect(self, websocket: WebSocket, user_id: int):
         await websocket.accept()
-        self.active_connections.append(websocket)
+        client = ClientConnection(websocket, user_id, on_closed=self._forget)
+        self.active_connections.setdefault(user_id, []).append(client)
+        client.start()
+
+    def disconnect(self, websocket: WebSocket, user_id: int):
+        for client in list(self.active_connections.get(user_id, [])):
+            if client.websocket is websocket:
+                client.close()
 
-    def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
+    def _forget(self, client: ClientConnection):
+        user_clients = self.active_connections.get(client.user_id, [])
+        if client in user_clients:
+            user_clients.remove(client)
+        if not user_clients:
+            self.active_connections.pop(client.user_id, None)
 
     async def send_personal_message(self, message: str, websocket: WebSocket):
         await websocket.send_text(message)
 
+    def send_to_user(self, user_id: int, message: str, coalesce_key: Optional[Hashable] = None):
+        """Queue a message on each of this worker's sockets for the user; never waits on the network."""
+        for client in list(self.active_connections.get(user_id, [])):
+            client.enqueue(message, coalesce_key)
+
+    def deliver(self, event: Dict[str, Any]):
+        coalesce_key = tuple(event["coalesce_key"]) if event.get("coalesce_key") else None
+        if event.get("user_id") is None:
+            for user_clients in list(self.active_connections.values()):
+                for client in list(user_clients):
+                    client.enqueue(event["message"], coalesce_key)
+        else:
+            self.send_to_user(event["user_id"], event["message"], coalesce_key)
+
+    async def publish_user_event(self, user_id: int, payload: Dict[str, Any], coalesce_key: Optional[List[Any]] = None):
+        await self.bus.publish({"user_id": user_id, "message": json.dumps(payload), "coalesce_key": coalesce_key})
+
+    async def publish_task_event(self, user_id: int, action: str, task_payload: Dict[str, Any]):
+        """Push a typed task delta (created/updated/deleted) to the owner's sockets only."""
+        await self.publish_user_event(
+            user_id, {"event": "task_update", "action": action, "task": task_payload}, coalesce_key=["task", task_payload["id"]]
+        )
+
+    async def publish_task_batch_event(self, user_id: int, changes: List[Dict[str, Any]]):
+        """Push several task deltas as one message; each change has the task_update action/task shape."""
+        await self.publish_user_event(user_id, {"event": "task_batch_update", "changes": changes})
+
     async def broadcast(self, message: str):
-        for connection in self.active_connections:
-            await connection.send_text(message)
+        await self.bus.publish({"user_id": None, "message": message, "coalesce_key": None})
 
 manager = ConnectionManager()
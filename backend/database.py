@@ -1,6 +1,10 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from pool_telemetry import PoolTelemetry, pool_options
 import os
 
 from dotenv import load_dotenv
@@ -15,18 +19,58 @@ print("-" * 30)
 print(f"BOOTING DATABASE WITH: {DB_CONNECTION_STRING}")
 print("-" * 30)
 
+sync_pool_telemetry = PoolTelemetry("sync")
+async_pool_telemetry = PoolTelemetry("async")
+
 db_engine = create_engine(
     DB_CONNECTION_STRING, 
-    pool_pre_ping=True,
-    connect_args={"charset": "utf8mb4"}
+    connect_args={"charset": "utf8mb4"} if DB_CONNECTION_STRING.startswith("mysql") else {},
+    **pool_options(DB_CONNECTION_STRING, QueuePool, sync_pool_telemetry)
 )
 
 LocalSession = sessionmaker(autocommit=False, autoflush=False, bind=db_engine)
 Base = declarative_base()
 
+# The request path uses an async driver so DB I/O never blocks the event loop;
+# migrations, CLIs and startup keep the sync engine above.
+ASYNC_DRIVERS = {
+    "mysql": "mysql+aiomysql",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+def async_database_url(url: str) -> str:
+    parsed_url = make_url(url)
+    return parsed_url.set(drivername=ASYNC_DRIVERS.get(parsed_url.get_backend_name(), parsed_url.drivername)).render_as_string(hide_password=False)
+
+ASYNC_DB_CONNECTION_STRING = os.getenv("ASYNC_DATABASE_URL") or async_database_url(DB_CONNECTION_STRING)
+
+def build_async_engine(url: str, telemetry: PoolTelemetry):
+    return create_async_engine(
+        url,
+        connect_args={"charset": "utf8mb4"} if url.startswith("mysql") else {},
+        **pool_options(url, AsyncAdaptedQueuePool, telemetry)
+    )
+
+def build_async_sessionmaker(engine):
+    # expire_on_commit=False: an expired attribute would need a lazy load, which AsyncSession cannot do implicitly
+    return async_sessionmaker(engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+async_db_engine = build_async_engine(ASYNC_DB_CONNECTION_STRING, async_pool_telemetry)
+AsyncLocalSession = build_async_sessionmaker(async_db_engine)
+
+def pool_stats():
+    return {
+        "sync": sync_pool_telemetry.stats(db_engine.pool),
+        "async": async_pool_telemetry.stats(async_db_engine.sync_engine.pool),
+    }
+
 def get_database_session():
     session = LocalSession()
     try:
         yield session
     finally:
         session.close()
+
+async def get_async_database_session():
+    async with AsyncLocalSession() as session:
+        yield session
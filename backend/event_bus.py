@@ -0,0 +1,135 @@
+"""
+Realtime event bus backends for ConnectionManager.
+
+Every uvicorn/gunicorn worker owns its own sockets, so task events have to be
+relayed between processes. The in-process bus is enough for a single worker;
+the SQLite bus uses a shared database file as a small broker that every
+worker on the host polls.
+"""
+from typing import Any, Callable, Dict, Optional
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+EventHandler = Callable[[Dict[str, Any]], None]
+
+class InProcessEventBus:
+    def __init__(self):
+        self.handler: Optional[EventHandler] = None
+
+    def subscribe(self, handler: EventHandler):
+        self.handler = handler
+
+    async def publish(self, event: Dict[str, Any]):
+        if self.handler:
+            self.handler(event)
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+class SQLiteEventBus:
+    """Cross-process bus backed by an append-only SQLite table that each worker tails."""
+
+    def __init__(self, db_path: str, poll_interval: float = 0.05, retention_seconds: float = 60):
+        self.db_path = db_path
+        self.poll_interval = poll_interval
+        self.retention_seconds = retention_seconds
+        self.origin = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.handler: Optional[EventHandler] = None
+        self.last_seen_id = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=5, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS realtime_events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                origin TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """)
+        self._poll_task: Optional[asyncio.Task] = None
+
+    def subscribe(self, handler: EventHandler):
+        self.handler = handler
+
+    async def publish(self, event: Dict[str, Any]):
+        # Deliver to this worker's sockets right away; other workers pick it up on their next poll
+        if self.handler:
+            self.handler(event)
+        await asyncio.to_thread(self._insert_event, json.dumps(event))
+
+    async def start(self):
+        if self._poll_task:
+            return
+        self.last_seen_id = await asyncio.to_thread(self._latest_event_id)
+        self._poll_task = asyncio.create_task(self._poll_events())
+
+    async def stop(self):
+        if self._poll_task:
+            self._poll_task.cancel()
+            try:
+                await self._poll_task
+            except asyncio.CancelledError:
+                pass
+            self._poll_task = None
+
+    def _insert_event(self, payload: str):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO realtime_events (origin, payload, created_at) VALUES (?, ?, ?)",
+                (self.origin, payload, time.time())
+            )
+
+    def _latest_event_id(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(MAX(id), 0) FROM realtime_events").fetchone()[0]
+
+    def _fetch_events_since(self, last_id: int):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT id, origin, payload FROM realtime_events WHERE id > ? ORDER BY id",
+                (last_id,)
+            ).fetchall()
+
+    def _prune_events(self):
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM realtime_events WHERE created_at < ?",
+                (time.time() - self.retention_seconds,)
+            )
+
+    async def _poll_events(self):
+        last_prune = time.monotonic()
+        while True:
+            try:
+                rows = await asyncio.to_thread(self._fetch_events_since, self.last_seen_id)
+                for row_id, origin, payload in rows:
+                    self.last_seen_id = row_id
+                    if origin != self.origin and self.handler:
+                        self.handler(json.loads(payload))
+
+                if time.monotonic() - last_prune > self.retention_seconds:
+                    await asyncio.to_thread(self._prune_events)
+                    last_prune = time.monotonic()
+            except sqlite3.Error as e:
+                print(f"Event Bus Error: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+def create_event_bus():
+    backend = os.getenv("EVENT_BUS_BACKEND", "memory")
+    if backend == "memory":
+        return InProcessEventBus()
+    if backend == "sqlite":
+        return SQLiteEventBus(
+            os.getenv("EVENT_BUS_SQLITE_PATH", "realtime_events.db"),
+            poll_interval=float(os.getenv("EVENT_BUS_POLL_INTERVAL_MS", "50")) / 1000,
+        )
+    raise ValueError("EVENT_BUS_BACKEND must be one of: memory, sqlite")
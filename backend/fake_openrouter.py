@@ -0,0 +1,64 @@
+"""
+Local stand-in for the OpenRouter chat completions API.
+
+Run it next to the backend and point the LLM client at it:
+    uvicorn fake_openrouter:app --port 8001
+    OPENROUTER_BASE_URL=http://localhost:8001/api/v1 OPENROUTER_API_KEY=fake uvicorn main:app
+
+FAKE_LLM_LATENCY_MS adds an artificial delay and FAKE_LLM_FAILURE_RATE makes
+that fraction of calls return HTTP 503, to exercise retries and the breaker.
+"""
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+import asyncio
+import json
+import os
+import random
+import time
+
+FAKE_LLM_LATENCY_MS = float(os.getenv("FAKE_LLM_LATENCY_MS", "50"))
+FAKE_LLM_FAILURE_RATE = float(os.getenv("FAKE_LLM_FAILURE_RATE", "0"))
+
+app = FastAPI(title="Fake OpenRouter")
+
+def fake_reply(messages):
+    system_prompt = messages[0]["content"] if messages else ""
+    if "Output strictly valid JSON" in system_prompt:
+        return '["Keep completing high-priority tasks first.", "Clear overdue tasks before starting new ones."]'
+    return f"(fake) You asked: {messages[-1]['content'] if messages else ''}"
+
+async def stream_reply(completion_id, model, reply):
+    yield ": FAKE OPENROUTER PROCESSING\n\n"
+    for word in reply.split(" "):
+        chunk = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "model": model,
+            "choices": [{"index": 0, "delta": {"content": word + " "}, "finish_reason": None}],
+        }
+        yield f"data: {json.dumps(chunk)}\n\n"
+        await asyncio.sleep(FAKE_LLM_LATENCY_MS / 1000 / 10)
+    yield "data: [DONE]\n\n"
+
+@app.post("/api/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    await asyncio.sleep(FAKE_LLM_LATENCY_MS / 1000)
+    if random.random() < FAKE_LLM_FAILURE_RATE:
+        return JSONResponse(status_code=503, content={"error": {"message": "fake upstream failure"}})
+
+    completion_id = f"fake-{int(time.time() * 1000)}"
+    reply = fake_reply(body.get("messages", []))
+    if body.get("stream"):
+        return StreamingResponse(stream_reply(completion_id, body.get("model"), reply), media_type="text/event-stream")
+
+    return {
+        "id": completion_id,
+        "object": "chat.completion",
+        "model": body.get("model"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": reply},
+            "finish_reason": "stop",
+        }],
+    }
@@ -0,0 +1,82 @@
+"""
+In-process cache for AI dashboard insights.
+
+Entries are keyed by a fingerprint of the stats that feed the prompt, so an
+unchanged dashboard reuses the last generated insights instead of calling
+the LLM again. Entries expire after a TTL and the least recently used ones
+are evicted once the cache is full. Expired entries are still returned
+(flagged as stale) so callers can serve them while a refresh runs.
+"""
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+import hashlib
+import json
+import os
+import threading
+import time
+
+INSIGHTS_CACHE_TTL_SECONDS = float(os.getenv("INSIGHTS_CACHE_TTL_SECONDS", "900"))
+INSIGHTS_CACHE_MAX_ENTRIES = int(os.getenv("INSIGHTS_CACHE_MAX_ENTRIES", "1024"))
+
+def stats_fingerprint(user_id: int, total, completed, pending, rate, avg_time, priorities, score, overdue) -> str:
+    # Round the floats to the precision used in the prompt so noise does not bust the cache
+    payload = json.dumps([
+        user_id, total, completed, pending, round(rate, 1), round(avg_time, 1),
+        priorities, score, overdue
+    ], sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class InsightsCache:
+    def __init__(self, max_entries: int = INSIGHTS_CACHE_MAX_ENTRIES, ttl_seconds: float = INSIGHTS_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, List[str]]]" = OrderedDict()
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        # Digest of the insights last stored for each user, for ETags (bounded like the entries)
+        self._user_digests: "OrderedDict[int, str]" = OrderedDict()
+
+    def lookup(self, fingerprint: str) -> Tuple[Optional[List[str]], bool]:
+        """Return (insights, is_fresh); insights is None on a miss."""
+        with self._lock:
+            entry = self._entries.get(fingerprint)
+            if entry is None:
+                return None, False
+            self._entries.move_to_end(fingerprint)
+            stored_at, insights = entry
+            return insights, (time.monotonic() - stored_at) < self.ttl_seconds
+
+    def store(self, fingerprint: str, insights: List[str], user_id: int):
+        digest = hashlib.sha256(json.dumps(insights).encode("utf-8")).hexdigest()[:16]
+        with self._lock:
+            self._entries[fingerprint] = (time.monotonic(), insights)
+            self._entries.move_to_end(fingerprint)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._user_digests[user_id] = digest
+            self._user_digests.move_to_end(user_id)
+            while len(self._user_digests) > self.max_entries:
+                self._user_digests.popitem(last=False)
+
+    def user_revision(self, user_id: int) -> str:
+        """Token that changes once new insights are stored for this user, for use in ETags.
+
+        It depends only on the insights' content, so other users' refreshes leave it
+        alone and workers holding the same insights agree on it.
+        """
+        with self._lock:
+            return self._user_digests.get(user_id, "none")
+
+    def begin_refresh(self, fingerprint: str) -> bool:
+        """Claim the refresh for a fingerprint; False if one is already running."""
+        with self._lock:
+            if fingerprint in self._refreshing:
+                return False
+            self._refreshing.add(fingerprint)
+            return True
+
+    def end_refresh(self, fingerprint: str):
+        with self._lock:
+            self._refreshing.discard(fingerprint)
+
+insights_cache = InsightsCache()
@@ -0,0 +1,292 @@
+"""
+Shared async client for outbound LLM (OpenRouter) calls.
+
+One pooled httpx.AsyncClient is reused for every call so connections stay
+alive between requests. A semaphore bounds the number of in-flight upstream
+calls, transient failures are retried with jittered exponential backoff, and
+a circuit breaker fails fast while the provider is down.
+
+Point OPENROUTER_BASE_URL at fake_openrouter.py to run without the real API.
+"""
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Dict, List, Optional
+import asyncio
+import json
+import os
+import random
+import time
+import httpx
+import metrics
+
+OPENROUTER_BASE_URL = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
+LLM_MODEL = os.getenv("LLM_MODEL", "openai/gpt-3.5-turbo")
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "20"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_RETRY_BASE_DELAY_SECONDS = float(os.getenv("LLM_RETRY_BASE_DELAY_SECONDS", "0.25"))
+LLM_BREAKER_FAILURE_THRESHOLD = int(os.getenv("LLM_BREAKER_FAILURE_THRESHOLD", "5"))
+LLM_BREAKER_COOLDOWN_SECONDS = float(os.getenv("LLM_BREAKER_COOLDOWN_SECONDS", "30"))
+
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+STREAM_DONE = object()
+
+class LLMError(Exception):
+    pass
+
+class LLMUnavailable(LLMError):
+    """Raised without calling upstream: no API key configured or the circuit is open."""
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int = LLM_BREAKER_FAILURE_THRESHOLD, cooldown_seconds: float = LLM_BREAKER_COOLDOWN_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.cooldown_seconds:
+            return "half_open"
+        return "open"
+
+    def allow_request(self) -> bool:
+        current_state = self.state
+        if current_state == "closed":
+            return True
+        if current_state == "half_open" and not self._trial_in_flight:
+            # Let a single trial call through to probe whether upstream recovered
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def release_trial(self):
+        """Give back a half-open trial slot whose call ended without a verdict (e.g. cancelled)."""
+        self._trial_in_flight = False
+
+    def record_success(self):
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        self._trial_in_flight = False
+        if self.opened_at is not None or self.consecutive_failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+def parse_stream_line(line: str):
+    """Extract the token text from one SSE line of a streamed completion.
+
+    Returns STREAM_DONE at the end of the stream and None for keep-alive
+    comments, blank lines and chunks without content.
+    """
+    if not line.startswith("data:"):
+        return None
+    data = line[len("data:"):].strip()
+    if data == "[DONE]":
+        return STREAM_DONE
+    try:
+        chunk = json.loads(data)
+        return chunk['choices'][0].get('delta', {}).get('content')
+    except (ValueError, KeyError, IndexError):
+        return None
+
+def record_llm_call(operation: str, outcome: str, started: float):
+    metrics.llm_requests.inc(operation=operation, outcome=outcome)
+    metrics.llm_request_duration.observe(time.perf_counter() - started, operation=operation, outcome=outcome)
+
+class LLMClient:
+    def __init__(
+        self,
+        base_url: str = OPENROUTER_BASE_URL,
+        model: str = LLM_MODEL,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        timeout_seconds: float = LLM_TIMEOUT_SECONDS,
+        max_retries: int = LLM_MAX_RETRIES,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.timeout_seconds = timeout_seconds
+        self.max_retries = max_retries
+        # Replaces the network transport, e.g. httpx.ASGITransport(app=fake_openrouter.app) in benchmarks
+        self.transport = transport
+        self.breaker = CircuitBreaker()
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _ensure_client(self) -> httpx.AsyncClient:
+        # The pool and semaphore belong to the running loop; rebuild them if the loop changed
+        running_loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not running_loop:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout_seconds,
+                transport=self.transport,
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency,
+                    max_keepalive_connections=self.max_concurrency,
+                ),
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._loop = running_loop
+        return self._client
+
+    def _headers(self) -> Dict[str, str]:
+        openrouter_key = os.getenv("OPENROUTER_API_KEY")
+        if not openrouter_key:
+            raise LLMUnavailable("OPENROUTER_API_KEY is not set")
+        return {
+            "Authorization": f"Bearer {openrouter_key}",
+            "Content-Type": "application/json",
+        }
+
+    def _payload(self, messages: List[Dict[str, str]], **extra: Any) -> Dict[str, Any]:
+        return {"model": self.model, "messages": messages, **extra}
+
+    async def _backoff(self, attempt: int):
+        delay = LLM_RETRY_BASE_DELAY_SECONDS * (2 ** attempt)
+        await asyncio.sleep(delay * random.uniform(0.5, 1.5))
+
+    async def chat_completion(self, messages: List[Dict[str, str]], timeout: Optional[float] = None, **extra: Any) -> str:
+        """Return the assistant message content for a chat completion request."""
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            content = await self._chat_completion(messages, timeout, **extra)
+            outcome = "success"
+            return content
+        except LLMUnavailable:
+            outcome = "unavailable"
+            raise
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
+        finally:
+            record_llm_call("chat_completion", outcome, started)
+
+    async def _chat_completion(self, messages: List[Dict[str, str]], timeout: Optional[float] = None, **extra: Any) -> str:
+        headers = self._headers()
+        client = self._ensure_client()
+        if not self.breaker.allow_request():
+            raise LLMUnavailable("LLM circuit breaker is open")
+
+        last_error: Optional[Exception] = None
+        try:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    async with self._semaphore:
+                        response = await client.post(
+                            "/chat/completions",
+                            headers=headers,
+                            json=self._payload(messages, **extra),
+                            timeout=timeout or self.timeout_seconds,
+                        )
+                    if response.status_code in RETRYABLE_STATUS_CODES:
+                        last_error = LLMError(f"Upstream returned HTTP {response.status_code}")
+                    else:
+                        response.raise_for_status()
+                        content = response.json()['choices'][0]['message']['content']
+                        self.breaker.record_success()
+                        return content
+                except httpx.TransportError as e:
+                    last_error = e
+                except (httpx.HTTPStatusError, KeyError, IndexError, ValueError) as e:
+                    # Non-retryable: a client error or a malformed body will not fix itself
+                    self.breaker.record_failure()
+                    raise LLMError(f"LLM request failed: {e}") from e
+
+                if attempt < self.max_retries:
+                    await self._backoff(attempt)
+        except asyncio.CancelledError:
+            self.breaker.release_trial()
+            raise
+
+        self.breaker.record_failure()
+        raise LLMError(f"LLM request failed after {self.max_retries + 1} attempts: {last_error}")
+
+    async def stream_chat_completion(self, messages: List[Dict[str, str]], timeout: Optional[float] = None, **extra: Any) -> AsyncIterator[str]:
+        """Yield content tokens as the upstream produces them (``stream: true``).
+
+        Retries only happen before the first token; closing the generator
+        (e.g. on client disconnect) closes the upstream response.
+        """
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            # aclosing: a disconnect must close the upstream stream now, not when the generator is collected
+            async with aclosing(self._stream_chat_completion(messages, timeout, **extra)) as tokens:
+                async for token in tokens:
+                    yield token
+            outcome = "success"
+        except LLMUnavailable:
+            outcome = "unavailable"
+            raise
+        except (GeneratorExit, asyncio.CancelledError):
+            outcome = "cancelled"
+            raise
+        finally:
+            record_llm_call("stream_chat_completion", outcome, started)
+
+    async def _stream_chat_completion(self, messages: List[Dict[str, str]], timeout: Optional[float] = None, **extra: Any) -> AsyncIterator[str]:
+        headers = self._headers()
+        client = self._ensure_client()
+        if not self.breaker.allow_request():
+            raise LLMUnavailable("LLM circuit breaker is open")
+
+        last_error: Optional[Exception] = None
+        try:
+            for attempt in range(self.max_retries + 1):
+                received_tokens = False
+                try:
+                    async with self._semaphore:
+                        async with client.stream(
+                            "POST",
+                            "/chat/completions",
+                            headers=headers,
+                            json=self._payload(messages, stream=True, **extra),
+                            timeout=timeout or self.timeout_seconds,
+                        ) as response:
+                            if response.status_code in RETRYABLE_STATUS_CODES:
+                                last_error = LLMError(f"Upstream returned HTTP {response.status_code}")
+                            else:
+                                response.raise_for_status()
+                                async for line in response.aiter_lines():
+                                    token = parse_stream_line(line)
+                                    if token is STREAM_DONE:
+                                        break
+                                    if token:
+                                        received_tokens = True
+                                        yield token
+                                self.breaker.record_success()
+                                return
+                except httpx.TransportError as e:
+                    if received_tokens:
+                        # Part of the answer was already relayed; replaying it would duplicate text
+                        self.breaker.record_failure()
+                        raise LLMError(f"LLM stream interrupted: {e}") from e
+                    last_error = e
+                except httpx.HTTPStatusError as e:
+                    self.breaker.record_failure()
+                    raise LLMError(f"LLM request failed: {e}") from e
+
+                if attempt < self.max_retries:
+                    await self._backoff(attempt)
+        except (GeneratorExit, asyncio.CancelledError):
+            self.breaker.release_trial()
+            raise
+
+        self.breaker.record_failure()
+        raise LLMError(f"LLM request failed after {self.max_retries + 1} attempts: {last_error}")
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+llm_client = LLMClient()
@@ -1,35 +1,78 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from database import db_engine, Base
-from routers import auth, tasks, profile, analytics, websocket, chat
+from contextlib import asynccontextmanager
+from database import db_engine, async_db_engine, pool_stats, Base
+from connection_manager import manager
+from llm_client import llm_client
+from user_cache import user_cache
+from password_hashing import password_pool
+from avatar_images import avatar_pool, UploadStaticFiles
+from read_replicas import replica_router
+from statement_budget import StatementBudgetMiddleware
+from compression import CompressionMiddleware
+from metrics import MetricsMiddleware, instrument_engine
+import request_profiler
+from routers import auth, tasks, profile, analytics, websocket, chat, metrics, profiling
 import os
 
 Base.metadata.create_all(bind=db_engine)
 
-app = FastAPI(title="Primetrade API")
+instrumented_engines = {"sync": db_engine, "async": async_db_engine.sync_engine}
+instrumented_engines.update({f"replica_{index}": replica_engine.sync_engine for index, (replica_engine, _, _) in enumerate(replica_router.replicas)})
+for engine_name, engine in instrumented_engines.items():
+    instrument_engine(engine, engine_name)
+
+@asynccontextmanager
+async def app_lifespan(app: FastAPI):
+    await manager.bus.start()
+    yield
+    await manager.bus.stop()
+    await llm_client.aclose()
+    password_pool.shutdown()
+    avatar_pool.shutdown()
+    await async_db_engine.dispose()
+    await replica_router.dispose()
+
+app = FastAPI(title="Primetrade API", lifespan=app_lifespan)
 
 os.makedirs("uploads/avatars", exist_ok=True)
 
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
+app.mount("/uploads", UploadStaticFiles(directory="uploads"), name="uploads")
 
 origins = os.getenv("ALLOWED_ORIGINS", "http://localhost:5173,http://localhost:3000").split(",")
 
+# Innermost, so profiles cover the endpoint rather than compression or CORS
+if request_profiler.PROFILING_ENABLED:
+    app.add_middleware(request_profiler.RequestProfilerMiddleware)
+
+app.add_middleware(StatementBudgetMiddleware)
+
+# JSON routes declare a response_model, so FastAPI already encodes them to bytes in pydantic-core;
+# a custom default_response_class (e.g. orjson) would switch that fast path off
+app.add_middleware(CompressionMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", request_profiler.PROFILE_ID_HEADER],
 )
 
+# Added last so it is outermost: latency covers every other middleware
+app.add_middleware(MetricsMiddleware)
+
 app.include_router(auth.router)
 app.include_router(tasks.router)
 app.include_router(profile.router)
 app.include_router(analytics.router)
 app.include_router(websocket.router)
 app.include_router(chat.router)
+app.include_router(metrics.router)
+if request_profiler.PROFILING_ENABLED:
+    app.include_router(profiling.router)
 
 @app.get("/")
 def api_status_check():
-    return {"status": "ok", "service": "Primetrade API Running"}
+    return {"status": "ok", "service": "Primetrade API Running", "user_cache": user_cache.stats(), "db_pool": pool_stats(), "db_replicas": replica_router.stats()}
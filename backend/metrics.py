@@ -0,0 +1,248 @@
+"""
+Prometheus-style metrics, rendered in the text exposition format at /metrics.
+
+Counters and histograms are updated in the request path: per-route request
+counts and latency (MetricsMiddleware), per-statement and per-request SQL
+counts and time (instrument_engine), and outbound LLM calls (llm_client).
+The per-request SQL usage (current_request_db) is the one source for the
+statement budgets and the request profiler as well.
+Gauges for state owned elsewhere (WebSocket connections, worker pools, DB
+pools) are read when /metrics is scraped; see routers/metrics.py.
+
+Values are per process: with several workers, scrape each one (or put them
+behind a per-worker port) and let Prometheus sum them.
+"""
+from contextlib import contextmanager
+from sqlalchemy import event
+from typing import Dict, Iterable, List, Optional, Tuple
+import contextvars
+import threading
+import time
+
+LATENCY_BUCKETS_SECONDS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+DB_STATEMENT_BUCKETS_SECONDS = [0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1]
+STATEMENTS_PER_REQUEST_BUCKETS = [0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89]
+LLM_LATENCY_BUCKETS_SECONDS = [0.25, 0.5, 1, 2, 4, 8, 15, 30, 60]
+
+def escape_label_value(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def format_labels(label_names: Iterable[str], label_values: Iterable) -> str:
+    pairs = [f'{name}="{escape_label_value(value)}"' for name, value in zip(label_names, label_values)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(labels[name] for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            return [f"{self.name}{format_labels(self.label_names, key)} {format_value(value)}" for key, value in self._values.items()]
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets: List[float], label_names: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.label_names = label_names
+        # label values -> [per-bucket counts (last is +Inf), sum, count]
+        self._series: Dict[Tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels[name] for name in self.label_names)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            bucket_index = len(self.buckets)
+            for index, upper_bound in enumerate(self.buckets):
+                if value <= upper_bound:
+                    bucket_index = index
+                    break
+            series[0][bucket_index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def samples(self) -> List[str]:
+        lines = []
+        with self._lock:
+            for key, (bucket_counts, total, count) in self._series.items():
+                cumulative = 0
+                for upper_bound, bucket_count in zip(self.buckets + [float("inf")], bucket_counts):
+                    cumulative += bucket_count
+                    labels = format_labels(self.label_names + ("le",), key + (format_value(upper_bound),))
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = format_labels(self.label_names, key)
+                lines.append(f"{self.name}_sum{labels} {format_value(total)}")
+                lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+class ScrapedMetric:
+    """Values read at scrape time from state owned elsewhere (``kind`` is gauge or counter)."""
+
+    def __init__(self, name: str, help_text: str, kind: str = "gauge", label_names: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.kind = kind
+        self.label_names = label_names
+        self.values: List[Tuple[Tuple, float]] = []
+
+    def set_values(self, values: List[Tuple[Tuple, float]]):
+        self.values = values
+
+    def samples(self) -> List[str]:
+        return [f"{self.name}{format_labels(self.label_names, key)} {format_value(value)}" for key, value in self.values]
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+registry = MetricsRegistry()
+
+http_requests = registry.register(Counter(
+    "http_requests_total", "HTTP requests by route template and status code.", ("method", "route", "status")))
+http_request_duration = registry.register(Histogram(
+    "http_request_duration_seconds", "Time from request start to the end of the response body.",
+    LATENCY_BUCKETS_SECONDS, ("method", "route")))
+db_statements = registry.register(Counter(
+    "db_statements_total", "SQL statements executed, by engine.", ("engine",)))
+db_statement_duration = registry.register(Histogram(
+    "db_statement_duration_seconds", "Execution time of single SQL statements.", DB_STATEMENT_BUCKETS_SECONDS, ("engine",)))
+db_statements_per_request = registry.register(Histogram(
+    "db_statements_per_request", "SQL statements issued while serving one request.",
+    STATEMENTS_PER_REQUEST_BUCKETS, ("method", "route")))
+db_time_per_request = registry.register(Histogram(
+    "db_time_per_request_seconds", "Total SQL execution time while serving one request.",
+    LATENCY_BUCKETS_SECONDS, ("method", "route")))
+llm_requests = registry.register(Counter(
+    "llm_requests_total", "Outbound LLM calls by outcome (success, error, unavailable, cancelled).", ("operation", "outcome")))
+llm_request_duration = registry.register(Histogram(
+    "llm_request_duration_seconds", "Outbound LLM call time, retries included.",
+    LLM_LATENCY_BUCKETS_SECONDS, ("operation", "outcome")))
+
+class RequestDbUsage:
+    """SQL issued while serving one request."""
+
+    def __init__(self):
+        self.statements = 0
+        self.seconds = 0.0
+        # (statement, started_at, elapsed, executemany) per statement, only while the profiler asks for it
+        self.trace: Optional[List[Tuple[str, float, float, bool]]] = None
+
+current_request_db: contextvars.ContextVar[Optional[RequestDbUsage]] = contextvars.ContextVar(
+    "current_request_db", default=None
+)
+requests_in_progress = 0
+
+@contextmanager
+def request_db_usage():
+    """The current request's usage; the outermost middleware that asks for it creates it."""
+    usage = current_request_db.get()
+    if usage is not None:
+        yield usage
+        return
+    usage = RequestDbUsage()
+    reset_token = current_request_db.set(usage)
+    try:
+        yield usage
+    finally:
+        current_request_db.reset(reset_token)
+
+def instrument_engine(engine, engine_name: str):
+    """Time every statement on ``engine``; pass ``AsyncEngine.sync_engine`` for async engines."""
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._db_started_at = time.perf_counter()
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context._db_started_at
+        db_statements.inc(engine=engine_name)
+        db_statement_duration.observe(elapsed, engine=engine_name)
+        usage = current_request_db.get()
+        if usage is not None:
+            usage.statements += 1
+            usage.seconds += elapsed
+            if usage.trace is not None:
+                usage.trace.append((statement, context._db_started_at, elapsed, executemany))
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+
+def route_label(scope) -> str:
+    # The route template keeps label cardinality bounded (no ids or query strings)
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        global requests_in_progress
+        started = time.perf_counter()
+        status_code = 500
+        requests_in_progress += 1
+        method = scope["method"]
+        observed = False
+
+        def observe_request(usage: RequestDbUsage):
+            nonlocal observed
+            if observed:
+                return
+            observed = True
+            route = route_label(scope)
+            http_requests.inc(method=method, route=route, status=status_code)
+            http_request_duration.observe(time.perf_counter() - started, method=method, route=route)
+            db_statements_per_request.observe(usage.statements, method=method, route=route)
+            db_time_per_request.observe(usage.seconds, method=method, route=route)
+
+        with request_db_usage() as usage:
+            async def send_with_status(message):
+                nonlocal status_code
+                if message["type"] == "http.response.start":
+                    status_code = message["status"]
+                await send(message)
+                # Starlette runs a response's BackgroundTasks before self.app returns; they are not part of the request
+                if message["type"] == "http.response.body" and not message.get("more_body", False):
+                    observe_request(usage)
+
+            try:
+                await self.app(scope, receive, send_with_status)
+            finally:
+                requests_in_progress -= 1
+                # No complete response went out (an error or a disconnect): observe what was spent
+                observe_request(usage)
@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, Text, DateTime
+from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, Text, DateTime, Date, Float, Index, DDL, event
 from sqlalchemy.orm import relationship
 from database import Base
 import datetime
@@ -35,3 +35,73 @@ class Task(Base):
     updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
 
     owner = relationship("User", back_populates="notes")
+
+    # Every hot query filters on user_id first; these also serve plain user_id lookups
+    __table_args__ = (
+        Index("ix_tasks_user_status", "user_id", "status"),
+        Index("ix_tasks_user_created", "user_id", "created_at"),
+        Index("ix_tasks_user_completed", "user_id", "completed_at"),
+    )
+
+# Full-text index over task titles and descriptions, used by task_search. MySQL has
+# FULLTEXT indexes; SQLite gets an FTS5 table over tasks that triggers keep in sync.
+TASK_SEARCH_DDL = {
+    "mysql": [
+        "CREATE FULLTEXT INDEX ft_tasks_title_description ON tasks (title, description)",
+    ],
+    "sqlite": [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5("
+        "title, description, content='tasks', content_rowid='id', "
+        "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+        "CREATE TRIGGER IF NOT EXISTS tasks_fts_insert AFTER INSERT ON tasks BEGIN "
+        "INSERT INTO tasks_fts(rowid, title, description) VALUES (new.id, new.title, new.description); END",
+        "CREATE TRIGGER IF NOT EXISTS tasks_fts_delete AFTER DELETE ON tasks BEGIN "
+        "INSERT INTO tasks_fts(tasks_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description); END",
+        "CREATE TRIGGER IF NOT EXISTS tasks_fts_update AFTER UPDATE OF title, description ON tasks BEGIN "
+        "INSERT INTO tasks_fts(tasks_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description); "
+        "INSERT INTO tasks_fts(rowid, title, description) VALUES (new.id, new.title, new.description); END",
+    ],
+}
+
+for search_dialect, search_statements in TASK_SEARCH_DDL.items():
+    for search_statement in search_statements:
+        event.listen(Task.__table__, "after_create", DDL(search_statement).execute_if(dialect=search_dialect))
+
+class UserTaskStats(Base):
+    """Per-user analytics rollup, kept in step with task writes by analytics_rollup."""
+    __tablename__ = "user_task_stats"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    total_tasks = Column(Integer, default=0, nullable=False)
+    completed_tasks = Column(Integer, default=0, nullable=False)
+    in_progress_tasks = Column(Integer, default=0, nullable=False)
+    pending_tasks = Column(Integer, default=0, nullable=False)
+    low_priority_tasks = Column(Integer, default=0, nullable=False)
+    medium_priority_tasks = Column(Integer, default=0, nullable=False)
+    high_priority_tasks = Column(Integer, default=0, nullable=False)
+    duration_count = Column(Integer, default=0, nullable=False)
+    duration_sum_hours = Column(Float, default=0.0, nullable=False)
+    duration_min_hours = Column(Float, nullable=True)
+    duration_max_hours = Column(Float, nullable=True)
+    completed_mon = Column(Integer, default=0, nullable=False)
+    completed_tue = Column(Integer, default=0, nullable=False)
+    completed_wed = Column(Integer, default=0, nullable=False)
+    completed_thu = Column(Integer, default=0, nullable=False)
+    completed_fri = Column(Integer, default=0, nullable=False)
+    completed_sat = Column(Integer, default=0, nullable=False)
+    completed_sun = Column(Integer, default=0, nullable=False)
+    completed_morning = Column(Integer, default=0, nullable=False)
+    completed_afternoon = Column(Integer, default=0, nullable=False)
+    completed_evening = Column(Integer, default=0, nullable=False)
+    completed_night = Column(Integer, default=0, nullable=False)
+    # Bumped by every task write; the ETags of the task and analytics reads are derived from it
+    change_version = Column(Integer, default=0, nullable=False)
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
+
+class UserDailyTaskStats(Base):
+    __tablename__ = "user_daily_task_stats"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    created_count = Column(Integer, default=0, nullable=False)
+    completed_count = Column(Integer, default=0, nullable=False)
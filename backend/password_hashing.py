@@ -0,0 +1,41 @@
+"""
+bcrypt hashing on a dedicated, size-limited process pool.
+
+Each hash or verify costs a few hundred milliseconds of CPU, so running it
+in the request threadpool lets a burst of logins starve every other
+endpoint. The async wrappers below hand the work to worker processes and
+refuse new work with PasswordPoolBusy once too many calls are queued.
+
+This module only imports bcrypt (and worker_pool) so pool workers start quickly.
+"""
+from worker_pool import BoundedProcessPool, WorkerPoolBusy
+import os
+import bcrypt
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_POOL_WORKERS = int(os.getenv("PASSWORD_POOL_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_POOL_MAX_PENDING = int(os.getenv("PASSWORD_POOL_MAX_PENDING", "64"))
+
+class PasswordPoolBusy(WorkerPoolBusy):
+    pass
+
+def hash_password_sync(password: str, rounds: int = BCRYPT_ROUNDS) -> str:
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=rounds)).decode('utf-8')
+
+def verify_password_sync(plain: str, hashed: str) -> bool:
+    return bcrypt.checkpw(plain.encode('utf-8'), hashed.encode('utf-8'))
+
+def hash_needs_rehash(hashed: str, rounds: int = BCRYPT_ROUNDS) -> bool:
+    # bcrypt hashes look like $2b$12$<salt+digest>; the third field is the cost factor
+    try:
+        return int(hashed.split("$")[2]) != rounds
+    except (IndexError, ValueError):
+        return True
+
+password_pool = BoundedProcessPool("password", PASSWORD_POOL_WORKERS, PASSWORD_POOL_MAX_PENDING, PasswordPoolBusy)
+
+async def hash_password(password: str) -> str:
+    return await password_pool.run(hash_password_sync, password, BCRYPT_ROUNDS)
+
+async def verify_password(plain: str, hashed: str) -> bool:
+    return await password_pool.run(verify_password_sync, plain, hashed)
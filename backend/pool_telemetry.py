@@ -0,0 +1,110 @@
+"""
+Connection-pool settings and instrumentation.
+
+Pool sizing comes from the environment, with defaults chosen per backend
+(MySQL, SQLite). Every pool built through pool_options() records checkouts,
+checkout wait times (as a histogram), timeouts and overflow checkouts, so
+the pool can be sized against the worker count instead of guessed.
+"""
+from sqlalchemy import exc
+from sqlalchemy.engine import make_url
+from typing import Any, Dict, List
+import os
+import threading
+import time
+
+# Upper bounds (milliseconds) of the checkout wait histogram; the last bucket is +Inf
+POOL_WAIT_BUCKETS_MS = [1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+
+POOL_PROFILES = {
+    # MySQL drops idle connections after wait_timeout; recycle well before proxies or the server do
+    "mysql": {"pool_size": 10, "max_overflow": 20, "pool_recycle": 1800, "pool_timeout": 10, "pool_pre_ping": True},
+    # SQLite connections are local files: no recycling or liveness checks needed
+    "sqlite": {"pool_size": 5, "max_overflow": 10, "pool_recycle": -1, "pool_timeout": 10, "pool_pre_ping": False},
+}
+
+def env_flag(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+def pool_settings(url: str) -> Dict[str, Any]:
+    """Pool keyword arguments for create_engine, from DB_POOL_* overrides on top of the backend profile."""
+    profile = POOL_PROFILES.get(make_url(url).get_backend_name(), POOL_PROFILES["mysql"])
+    return {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", profile["pool_size"])),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", profile["max_overflow"])),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE_SECONDS", profile["pool_recycle"])),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT_SECONDS", profile["pool_timeout"])),
+        "pool_pre_ping": env_flag("DB_POOL_PRE_PING", profile["pool_pre_ping"]),
+    }
+
+class PoolTelemetry:
+    def __init__(self, name: str, buckets: List[float] = POOL_WAIT_BUCKETS_MS):
+        self.name = name
+        self.buckets = buckets
+        self.checkouts = 0
+        self.timeouts = 0
+        self.overflow_checkouts = 0
+        self.wait_counts = [0] * (len(buckets) + 1)
+        self.wait_sum_ms = 0.0
+        self.wait_max_ms = 0.0
+        self._lock = threading.Lock()
+
+    def observe_checkout(self, wait_ms: float, overflowed: bool):
+        with self._lock:
+            self.checkouts += 1
+            self.overflow_checkouts += 1 if overflowed else 0
+            self.wait_sum_ms += wait_ms
+            self.wait_max_ms = max(self.wait_max_ms, wait_ms)
+            self.wait_counts[self._bucket_index(wait_ms)] += 1
+
+    def observe_timeout(self, wait_ms: float):
+        with self._lock:
+            self.timeouts += 1
+            self.wait_max_ms = max(self.wait_max_ms, wait_ms)
+
+    def _bucket_index(self, wait_ms: float) -> int:
+        for index, upper_bound in enumerate(self.buckets):
+            if wait_ms <= upper_bound:
+                return index
+        return len(self.buckets)
+
+    def stats(self, pool) -> Dict[str, Any]:
+        if not hasattr(pool, "checkedout"):
+            return {"pool": type(pool).__name__}
+        with self._lock:
+            bucket_labels = [str(bound) for bound in self.buckets] + ["+Inf"]
+            return {
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "overflow": pool.overflow(),
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "overflow_checkouts": self.overflow_checkouts,
+                "wait_ms_avg": round(self.wait_sum_ms / self.checkouts, 3) if self.checkouts else 0.0,
+                "wait_ms_max": round(self.wait_max_ms, 3),
+                "wait_ms_histogram": dict(zip(bucket_labels, self.wait_counts)),
+            }
+
+def instrumented_pool_class(base_pool_class, telemetry: PoolTelemetry):
+    """Subclass a QueuePool variant so every checkout is timed; recreate() keeps the subclass."""
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = base_pool_class._do_get(self)
+        except exc.TimeoutError:
+            telemetry.observe_timeout((time.perf_counter() - started) * 1000)
+            raise
+        telemetry.observe_checkout((time.perf_counter() - started) * 1000, self.checkedout() > self.size())
+        return connection
+
+    return type(f"Instrumented{base_pool_class.__name__}", (base_pool_class,), {"_do_get": _do_get})
+
+def pool_options(url: str, base_pool_class, telemetry: PoolTelemetry) -> Dict[str, Any]:
+    parsed_url = make_url(url)
+    if parsed_url.get_backend_name() == "sqlite" and parsed_url.database in (None, "", ":memory:"):
+        # In-memory SQLite lives in a single connection; there is no pool to tune
+        return {}
+    return {"poolclass": instrumented_pool_class(base_pool_class, telemetry), **pool_settings(url)}
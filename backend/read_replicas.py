@@ -0,0 +1,93 @@
+"""
+Routing of read-only request sessions to database replicas.
+
+Set DATABASE_REPLICA_URLS to a comma-separated list of replica URLs (sync
+or async form; the async driver is derived like ASYNC_DATABASE_URL). Read
+endpoints depend on get_read_database_session / retrieve_current_reader
+and are spread round-robin over the replicas; everything else stays on the
+primary. After a user's own write, note_write() pins that user's reads to
+the primary for REPLICA_STICKY_SECONDS so they read their own writes
+despite replication lag. Stickiness is tracked per worker, so keep the
+window above the replicas' typical lag.
+
+With no replicas configured every read goes to the primary.
+"""
+from fastapi import Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, Dict, List, Optional
+import itertools
+import os
+import threading
+import time
+import database
+import auth as auth_utils
+from pool_telemetry import PoolTelemetry
+
+REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+REPLICA_STICKY_SECONDS = float(os.getenv("REPLICA_STICKY_SECONDS", "5"))
+
+class ReplicaRouter:
+    def __init__(self, replica_urls: List[str] = REPLICA_URLS, sticky_seconds: float = REPLICA_STICKY_SECONDS):
+        self.sticky_seconds = sticky_seconds
+        self.replicas = []
+        for index, url in enumerate(replica_urls):
+            telemetry = PoolTelemetry(f"replica_{index}")
+            engine = database.build_async_engine(database.async_database_url(url), telemetry)
+            self.replicas.append((engine, database.build_async_sessionmaker(engine), telemetry))
+        self._next_replica = itertools.cycle(self.replicas) if self.replicas else None
+        self._sticky_until: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.replica_reads = 0
+        self.primary_reads = 0
+
+    def note_write(self, username: str):
+        """Pin ``username``'s reads to the primary until its replicas have caught up."""
+        if not self.replicas:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if len(self._sticky_until) > 10000:
+                self._sticky_until = {name: until for name, until in self._sticky_until.items() if until > now}
+            self._sticky_until[username] = now + self.sticky_seconds
+
+    def is_sticky(self, username: Optional[str]) -> bool:
+        with self._lock:
+            return username is not None and self._sticky_until.get(username, 0.0) > time.monotonic()
+
+    def sessionmaker_for(self, username: Optional[str]):
+        if not self.replicas or self.is_sticky(username):
+            self.primary_reads += 1
+            return database.AsyncLocalSession
+        with self._lock:
+            _, replica_sessionmaker, _ = next(self._next_replica)
+        self.replica_reads += 1
+        return replica_sessionmaker
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "replicas": len(self.replicas),
+            "replica_reads": self.replica_reads,
+            "primary_reads": self.primary_reads,
+            "pools": {telemetry.name: telemetry.stats(engine.sync_engine.pool) for engine, _, telemetry in self.replicas},
+        }
+
+    async def dispose(self):
+        for engine, _, _ in self.replicas:
+            await engine.dispose()
+
+replica_router = ReplicaRouter()
+
+async def get_read_database_session(token: str = Depends(auth_utils.oauth2_scheme)):
+    async with replica_router.sessionmaker_for(auth_utils.decode_token_subject(token))() as session:
+        yield session
+
+async def retrieve_current_reader(token: str = Depends(auth_utils.oauth2_scheme), db: AsyncSession = Depends(get_read_database_session)):
+    """retrieve_current_user for read-only routes: the user lookup runs on the routed session."""
+    try:
+        return await auth_utils.load_token_user(token, db)
+    except HTTPException:
+        if db.bind is database.async_db_engine:
+            raise
+        # A freshly registered account may not have reached the replica yet
+        async with database.AsyncLocalSession() as primary_session:
+            return await auth_utils.load_token_user(token, primary_session)
@@ -0,0 +1,236 @@
+"""
+Opt-in profiling of single requests, for debugging slow endpoints.
+
+With PROFILING_ENABLED=true, a request is profiled when it carries
+``X-Profile-Request: 1`` (or the PROFILING_TRIGGER_TOKEN value, when that
+is set) or is picked by PROFILING_SAMPLE_RATE. For a profiled request:
+
+* a sampler thread snapshots the event loop thread's Python stack every
+  PROFILING_SAMPLE_INTERVAL_MS while this request's task is the one
+  running, and aggregates the stacks in collapsed format ("a;b;c 12"),
+  ready for flamegraph.pl or speedscope;
+* every SQL statement is recorded with its start offset and duration,
+  taken from the request's metrics.current_request_db trace.
+
+Samples taken while the loop runs another task, or sits idle waiting on
+I/O (a DB round trip, the LLM), are counted but not attributed, so
+``samples`` vs ``idle_samples`` tells CPU-bound from I/O-bound. Work handed
+to worker threads or processes is only visible through its wall time.
+
+Finished profiles go into a bounded ring buffer served by routers/profiling.py,
+and the response carries X-Profile-Id to look them up.
+"""
+from collections import Counter, deque
+from typing import Any, Dict, List, Optional
+from metrics import request_db_usage
+import asyncio
+import itertools
+import os
+import random
+import sys
+import threading
+import time
+
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() in ("1", "true", "yes", "on")
+PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", "0"))
+PROFILING_SAMPLE_INTERVAL_MS = float(os.getenv("PROFILING_SAMPLE_INTERVAL_MS", "2"))
+PROFILING_BUFFER_SIZE = int(os.getenv("PROFILING_BUFFER_SIZE", "50"))
+PROFILING_TRIGGER_TOKEN = os.getenv("PROFILING_TRIGGER_TOKEN")
+
+PROFILE_TRIGGER_HEADER = "x-profile-request"
+PROFILE_ID_HEADER = "X-Profile-Id"
+MAX_STACK_DEPTH = 128
+MAX_STATEMENT_CHARS = 2000
+
+def frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+def collapsed_stack(frame) -> str:
+    labels = []
+    while frame is not None and len(labels) < MAX_STACK_DEPTH:
+        labels.append(frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+class RequestProfile:
+    def __init__(self, profile_id: int, method: str, path: str, interval_seconds: float):
+        self.profile_id = profile_id
+        self.method = method
+        self.path = path
+        self.interval_seconds = interval_seconds
+        self.started_at = time.time()
+        self.started = time.perf_counter()
+        self.wall_ms = 0.0
+        self.status_code: Optional[int] = None
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.other_task_samples = 0
+        self.idle_samples = 0
+        self.statements: List[Dict[str, Any]] = []
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+
+    def start_sampling(self, loop: asyncio.AbstractEventLoop, task: asyncio.Task):
+        loop_thread_id = threading.get_ident()
+        self._sampler = threading.Thread(
+            target=self._sample, args=(loop, task, loop_thread_id), name=f"profile-{self.profile_id}", daemon=True
+        )
+        self._sampler.start()
+
+    def _sample(self, loop, task, loop_thread_id: int):
+        while not self._stop.wait(self.interval_seconds):
+            running_task = asyncio.current_task(loop)
+            if running_task is None:
+                self.idle_samples += 1
+                continue
+            if running_task is not task:
+                self.other_task_samples += 1
+                continue
+            frame = sys._current_frames().get(loop_thread_id)
+            if frame is not None:
+                self.stacks[collapsed_stack(frame)] += 1
+                self.samples += 1
+
+    def finish(self, status_code: Optional[int]):
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+        self.status_code = status_code
+        self.wall_ms = (time.perf_counter() - self.started) * 1000
+
+    def record_statement(self, statement: str, started: float, elapsed: float, executemany: bool):
+        self.statements.append({
+            "offset_ms": round((started - self.started) * 1000, 3),
+            "duration_ms": round(elapsed * 1000, 3),
+            "statement": statement[:MAX_STATEMENT_CHARS],
+            "executemany": executemany,
+        })
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "id": self.profile_id,
+            "method": self.method,
+            "path": self.path,
+            "status_code": self.status_code,
+            "started_at": self.started_at,
+            "wall_ms": round(self.wall_ms, 3),
+            "sample_interval_ms": self.interval_seconds * 1000,
+            "samples": self.samples,
+            "other_task_samples": self.other_task_samples,
+            "idle_samples": self.idle_samples,
+            "sql_statements": len(self.statements),
+            "sql_ms": round(sum(entry["duration_ms"] for entry in self.statements), 3),
+        }
+
+    def details(self) -> Dict[str, Any]:
+        return {**self.summary(), "statements": self.statements, "top_stacks": [
+            {"stack": stack, "samples": count} for stack, count in self.stacks.most_common(20)
+        ]}
+
+class ProfileStore:
+    """Ring buffer of the most recent finished profiles."""
+
+    def __init__(self, max_profiles: int = PROFILING_BUFFER_SIZE):
+        self._profiles = deque(maxlen=max_profiles)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def next_id(self) -> int:
+        with self._lock:
+            return next(self._ids)
+
+    def add(self, profile: RequestProfile):
+        with self._lock:
+            self._profiles.append(profile)
+
+    def get(self, profile_id: int) -> Optional[RequestProfile]:
+        with self._lock:
+            return next((profile for profile in self._profiles if profile.profile_id == profile_id), None)
+
+    def recent(self) -> List[RequestProfile]:
+        with self._lock:
+            return list(reversed(self._profiles))
+
+profile_store = ProfileStore()
+
+# The sampler needs the GIL to take a sample, and by default a busy loop thread only yields it
+# every 5 ms; while any profile runs, the switch interval is lowered to the sample interval
+_active_profiles = 0
+_active_profiles_lock = threading.Lock()
+_default_switch_interval = sys.getswitchinterval()
+
+def _enter_profiling(interval_seconds: float):
+    global _active_profiles
+    with _active_profiles_lock:
+        _active_profiles += 1
+        sys.setswitchinterval(min(interval_seconds, _default_switch_interval))
+
+def _exit_profiling():
+    global _active_profiles
+    with _active_profiles_lock:
+        _active_profiles -= 1
+        if _active_profiles == 0:
+            sys.setswitchinterval(_default_switch_interval)
+
+def should_profile(trigger_value: Optional[str]) -> bool:
+    if trigger_value is not None:
+        expected = PROFILING_TRIGGER_TOKEN or "1"
+        return trigger_value == expected
+    return PROFILING_SAMPLE_RATE > 0 and random.random() < PROFILING_SAMPLE_RATE
+
+class RequestProfilerMiddleware:
+    def __init__(self, app, store: ProfileStore = profile_store, interval_ms: float = PROFILING_SAMPLE_INTERVAL_MS):
+        self.app = app
+        self.store = store
+        self.interval_seconds = interval_ms / 1000
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        trigger_value = next(
+            (value.decode("latin-1") for name, value in scope["headers"] if name == PROFILE_TRIGGER_HEADER.encode()), None
+        )
+        if not should_profile(trigger_value):
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(self.store.next_id(), scope["method"], scope["path"], self.interval_seconds)
+        status_code = None
+        finished = False
+
+        with request_db_usage() as usage:
+            def finish_profile():
+                nonlocal finished
+                if finished:
+                    return
+                finished = True
+                for statement, started, elapsed, executemany in usage.trace:
+                    profile.record_statement(statement, started, elapsed, executemany)
+                usage.trace = None
+                profile.finish(status_code)
+                _exit_profiling()
+                self.store.add(profile)
+
+            async def send_with_profile_id(message):
+                nonlocal status_code
+                if message["type"] == "http.response.start":
+                    status_code = message["status"]
+                    message.setdefault("headers", [])
+                    message["headers"] = list(message["headers"]) + [(PROFILE_ID_HEADER.lower().encode(), str(profile.profile_id).encode())]
+                await send(message)
+                # Background tasks run after this, inside self.app; keep them out of the profile
+                if message["type"] == "http.response.body" and not message.get("more_body", False):
+                    finish_profile()
+
+            usage.trace = []
+            _enter_profiling(self.interval_seconds)
+            profile.start_sampling(asyncio.get_running_loop(), asyncio.current_task())
+            try:
+                await self.app(scope, receive, send_with_profile_id)
+            finally:
+                finish_profile()
@@ -1,23 +1,43 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, BackgroundTasks, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Dict, Any
-import models, database
-import auth as auth_utils
+import models, analytics_rollup
+from connection_manager import manager
+from read_replicas import get_read_database_session, retrieve_current_reader
+from insights_cache import insights_cache, stats_fingerprint
+from conditional_get import (
+    ANALYTICS_ETAG_WINDOW_SECONDS, load_change_version, weak_etag, etag_matches, cache_headers, not_modified,
+)
+from llm_client import llm_client
 from datetime import datetime, timedelta
-import requests
 import os
 import json
+import time
 
 router = APIRouter(prefix="/analytics", tags=["Analytics"])
 
 @router.get("/", response_model=Dict[str, Any])
-def retrieve_dashboard_metrics(
-    active_user: models.User = Depends(auth_utils.retrieve_current_user), 
-    db_session: Session = Depends(database.get_database_session)
+async def retrieve_dashboard_metrics(
+    request: Request,
+    response: Response,
+    background_tasks: BackgroundTasks,
+    active_user: models.User = Depends(retrieve_current_reader), 
+    db_session: AsyncSession = Depends(get_read_database_session)
 ):
-    user_task_list = db_session.query(models.Task).filter(models.Task.user_id == active_user.id).all()
+    change_version = await load_change_version(db_session, active_user.id)
+    if change_version is not None:
+        etag = weak_etag(
+            "analytics", active_user.id, change_version, insights_cache.user_revision(active_user.id),
+            int(time.time() // ANALYTICS_ETAG_WINDOW_SECONDS)
+        )
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return not_modified(etag)
+        response.headers.update(cache_headers(etag))
+
+    # The rollup readers are written against the sync Session API; run_sync drives them over the async connection
+    task_metrics = await db_session.run_sync(analytics_rollup.load_dashboard_metrics, active_user.id)
     
-    if not user_task_list:
+    if task_metrics["total"] == 0:
         return {
             "total_tasks": 0,
             "completed_tasks": 0,
@@ -40,31 +60,19 @@ def retrieve_dashboard_metrics(
             "overdue_tasks": 0
         }
     
-    total_count = len(user_task_list)
-    completed_count = len([t for t in user_task_list if t.status == 'completed'])
-    in_progress_count = len([t for t in user_task_list if t.status == 'in_progress'])
-    pending_count = len([t for t in user_task_list if t.status == 'pending'])
+    total_count = task_metrics["total"]
+    completed_count = task_metrics["completed"]
+    in_progress_count = task_metrics["in_progress"]
+    pending_count = task_metrics["pending"]
     
     comp_rate = (completed_count / total_count * 100) if total_count > 0 else 0
     
-    durations = []
-    for task_item in user_task_list:
-        if task_item.completed_at and task_item.started_at:
-            delta = task_item.completed_at - task_item.started_at
-            durations.append(delta.total_seconds() / 3600)
-    
-    mean_duration = sum(durations) / len(durations) if durations else 0
-    min_duration = min(durations) if durations else 0
-    max_duration = max(durations) if durations else 0
-    
-    priority_breakdown = {
-        "low": len([t for t in user_task_list if t.priority == 'low']),
-        "medium": len([t for t in user_task_list if t.priority == 'medium']),
-        "high": len([t for t in user_task_list if t.priority == 'high'])
-    }
+    mean_duration = task_metrics["mean_duration"]
+    min_duration = task_metrics["min_duration"]
+    max_duration = task_metrics["max_duration"]
     
-    current_time = datetime.now()
-    late_count = len([t for t in user_task_list if t.due_date and t.due_date < current_time and t.status != 'completed'])
+    priority_breakdown = task_metrics["priorities"]
+    late_count = task_metrics["overdue"]
     
     score_val = min(100, int(
         (comp_rate * 0.4) +
@@ -76,65 +84,37 @@ def retrieve_dashboard_metrics(
     trend_data = []
     for day_offset in range(6, -1, -1):
         target_date = datetime.now() - timedelta(days=day_offset)
-        start_of_day = target_date.replace(hour=0, minute=0, second=0, microsecond=0)
-        end_of_day = start_of_day + timedelta(days=1)
-        
-        daily_completed = len([
-            t for t in user_task_list 
-            if t.completed_at and start_of_day <= t.completed_at < end_of_day
-        ])
-        
-        daily_created = len([
-            t for t in user_task_list 
-            if start_of_day <= t.created_at < end_of_day
-        ])
-        
+        day_key = target_date.strftime("%Y-%m-%d")
         trend_data.append({
-            "date": target_date.strftime("%Y-%m-%d"),
+            "date": day_key,
             "day": target_date.strftime("%a"),
-            "completed": daily_completed,
-            "created": daily_created
+            "completed": task_metrics["daily_completed"].get(day_key, 0),
+            "created": task_metrics["daily_created"].get(day_key, 0)
         })
     
     weekly_dist = []
     for day_idx in range(7):
         day_label = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun'][day_idx]
-        day_completed = len([
-            t for t in user_task_list
-            if t.completed_at and t.completed_at.weekday() == day_idx
-        ])
-        weekly_dist.append({"day": day_label, "completed": day_completed})
+        weekly_dist.append({"day": day_label, "completed": task_metrics["weekday_completed"].get(day_idx, 0)})
     
-    time_slots = {"morning": 0, "afternoon": 0, "evening": 0, "night": 0}
-    for t_item in user_task_list:
-        if t_item.completed_at:
-            hr = t_item.completed_at.hour
-            if 6 <= hr < 12:
-                time_slots["morning"] += 1
-            elif 12 <= hr < 18:
-                time_slots["afternoon"] += 1
-            elif 18 <= hr < 22:
-                time_slots["evening"] += 1
-            else:
-                time_slots["night"] += 1
+    time_slots = task_metrics["time_slots"]
     
-    
-    # Try AI generation first
+    # Serve cached AI insights (or the manual ones) right away; the LLM call never runs in the request path
     openrouter_key = os.getenv("OPENROUTER_API_KEY")
-    insights_list = []
-    
-    if openrouter_key:
-        try:
-            insights_list = generate_ai_insights(
-                active_user.username, total_count, completed_count, pending_count, 
-                comp_rate, mean_duration, priority_breakdown, score_val, late_count
-            )
-        except Exception as e:
-            print(f"AI Insights Error: {e}")
-            # Fallback will be used if list remains empty or error occurs
-            pass
+    fingerprint = stats_fingerprint(
+        active_user.id, total_count, completed_count, pending_count,
+        comp_rate, mean_duration, priority_breakdown, score_val, late_count
+    )
+    insights_list, is_fresh = insights_cache.lookup(fingerprint)
+
+    if openrouter_key and not is_fresh and insights_cache.begin_refresh(fingerprint):
+        background_tasks.add_task(
+            refresh_ai_insights, fingerprint, active_user.id, active_user.username,
+            total_count, completed_count, pending_count, comp_rate, mean_duration,
+            priority_breakdown, score_val, late_count
+        )
 
-    # Use manual fallback if AI failed or returned nothing
+    # Use manual fallback until AI insights for these stats are cached
     if not insights_list:
         insights_list = generate_manual_insights(
             total_count, completed_count, in_progress_count, pending_count,
@@ -209,9 +189,22 @@ def generate_manual_insights(total, completed, in_prog, pending, rate, avg_t, pr
     
     return suggestions[:7]
 
-def generate_ai_insights(username, total, completed, pending, rate, avg_time, priorities, score, overdue):
-    openrouter_key = os.getenv("OPENROUTER_API_KEY")
-    
+async def refresh_ai_insights(fingerprint, user_id, username, total, completed, pending, rate, avg_time, priorities, score, overdue):
+    try:
+        fresh_insights = await generate_ai_insights(
+            username, total, completed, pending, rate, avg_time, priorities, score, overdue
+        )
+        if fresh_insights:
+            insights_cache.store(fingerprint, fresh_insights, user_id)
+            await manager.publish_user_event(
+                user_id, {"event": "insights_update", "ai_insights": fresh_insights}, coalesce_key=["insights"]
+            )
+    except Exception as e:
+        print(f"AI Insights Error: {e}")
+    finally:
+        insights_cache.end_refresh(fingerprint)
+
+async def generate_ai_insights(username, total, completed, pending, rate, avg_time, priorities, score, overdue):
     prompt = f"""
     Analyze the productivity of user '{username}':
     - Total Tasks: {total}
@@ -227,34 +220,22 @@ def generate_ai_insights(username, total, completed, pending, rate, avg_time, pr
     """
     
     try:
-        response = requests.post(
-            url="https://openrouter.ai/api/v1/chat/completions",
-            headers={
-                "Authorization": f"Bearer {openrouter_key}",
-                "Content-Type": "application/json",
-                # "HTTP-Referer": "http://localhost:5173", 
-            },
-            json={
-                "model": "openai/gpt-3.5-turbo",
-                "messages": [
-                    {"role": "system", "content": "You are a productivity expert analyst. Output strictly valid JSON."},
-                    {"role": "user", "content": prompt}
-                ]
-            },
-            timeout=5 # Short timeout to prevent long page loads
+        content = await llm_client.chat_completion(
+            [
+                {"role": "system", "content": "You are a productivity expert analyst. Output strictly valid JSON."},
+                {"role": "user", "content": prompt}
+            ],
+            timeout=5 # Short timeout; insights are refreshed in the background
         )
-        
-        if response.status_code == 200:
-            content = response.json()['choices'][0]['message']['content']
-            # Attempt to parse JSON
-            try:
-                # Clean up potential markdown formatting ```json ... ```
-                if "```" in content:
-                    content = content.replace("```json", "").replace("```", "")
-                return json.loads(content)
-            except:
-                # If parsing fails, just return the raw text as a single insight if it's short, or split by lines
-                return [line.strip("- *") for line in content.split("\n") if line.strip()]
+        # Attempt to parse JSON
+        try:
+            # Clean up potential markdown formatting ```json ... ```
+            if "```" in content:
+                content = content.replace("```json", "").replace("```", "")
+            return json.loads(content)
+        except:
+            # If parsing fails, just return the raw text as a single insight if it's short, or split by lines
+            return [line.strip("- *") for line in content.split("\n") if line.strip()]
     except Exception as e:
         print(f"AI Generation Error: {e}")
             
@@ -1,11 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi.security import OAuth2PasswordRequestForm
+from fastapi.concurrency import run_in_threadpool
 from datetime import timedelta
 from google.oauth2 import id_token
 from google.auth.transport import requests
 import models, schemas, database
 import auth as auth_utils
+from user_cache import user_cache
 import os
 
 router = APIRouter(
@@ -14,30 +17,39 @@ router = APIRouter(
 )
 
 @router.post("/register", response_model=schemas.User)
-def create_user_account(user_data: schemas.UserCreate, db_session: Session = Depends(database.get_database_session)):
-    existing_user = db_session.query(models.User).filter(
+async def create_user_account(user_data: schemas.UserCreate, db_session: AsyncSession = Depends(database.get_async_database_session)):
+    existing_user = (await db_session.execute(select(models.User).where(
         (models.User.username == user_data.username) | (models.User.email == user_data.email)
-    ).first()
+    ))).scalars().first()
     if existing_user:
         raise HTTPException(status_code=400, detail="Registration failed: User already exists")
     
-    secure_password = auth_utils.hash_passwd(user_data.password)
-    new_user_record = models.User(username=user_data.username, email=user_data.email, hashed_password=secure_password)
+    secure_password = await auth_utils.hash_passwd_async(user_data.password)
+    # A new account has no tasks; setting notes up front avoids a lazy load, which AsyncSession cannot do
+    new_user_record = models.User(username=user_data.username, email=user_data.email, hashed_password=secure_password, notes=[])
     db_session.add(new_user_record)
-    db_session.commit()
-    db_session.refresh(new_user_record)
+    await db_session.flush()
+    # Start the analytics rollup empty so the first task write is a plain increment
+    db_session.add(models.UserTaskStats(user_id=new_user_record.id))
+    await db_session.commit()
     return new_user_record
 
 @router.post("/login", response_model=schemas.Token)
-def authenticate_user(login_data: OAuth2PasswordRequestForm = Depends(), db_session: Session = Depends(database.get_database_session)):
-    user_record = db_session.query(models.User).filter(models.User.username == login_data.username).first()
-    if not user_record or not auth_utils.verify_passwd(login_data.password, user_record.hashed_password):
+async def authenticate_user(login_data: OAuth2PasswordRequestForm = Depends(), db_session: AsyncSession = Depends(database.get_async_database_session)):
+    user_record = (await db_session.execute(auth_utils.user_by_username(login_data.username))).scalars().first()
+    if not user_record or not await auth_utils.verify_passwd_async(login_data.password, user_record.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    # Transparently upgrade hashes created with a different bcrypt cost factor
+    if auth_utils.passwd_needs_rehash(user_record.hashed_password):
+        user_record.hashed_password = await auth_utils.hash_passwd_async(login_data.password)
+        await db_session.commit()
+        user_cache.invalidate(user_record.username)
+    
     token_expiry = timedelta(minutes=auth_utils.TOKEN_EXPIRE_MINUTES)
     auth_token = auth_utils.generate_access_token(
         data={"sub": user_record.username}, expires_delta=token_expiry
@@ -45,7 +57,7 @@ def authenticate_user(login_data: OAuth2PasswordRequestForm = Depends(), db_sess
     return {"access_token": auth_token, "token_type": "bearer"}
 
 @router.post("/google", response_model=schemas.Token)
-def google_authentication(token_payload: dict, db_session: Session = Depends(database.get_database_session)):
+async def google_authentication(token_payload: dict, db_session: AsyncSession = Depends(database.get_async_database_session)):
     g_token = token_payload.get("token")
     GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID")
     
@@ -53,19 +65,21 @@ def google_authentication(token_payload: dict, db_session: Session = Depends(dat
         raise HTTPException(status_code=500, detail="Google Client ID not configured")
 
     try:
-        id_info = id_token.verify_oauth2_token(g_token, requests.Request(), GOOGLE_CLIENT_ID)
+        # Fetching Google's certificates is blocking network I/O; keep it off the event loop
+        id_info = await run_in_threadpool(id_token.verify_oauth2_token, g_token, requests.Request(), GOOGLE_CLIENT_ID)
         user_email = id_info['email']
         user_name = user_email.split('@')[0]
         
-        user_record = db_session.query(models.User).filter(models.User.email == user_email).first()
+        user_record = (await db_session.execute(select(models.User).where(models.User.email == user_email))).scalars().first()
         
         if not user_record:
             random_secret = os.urandom(24).hex()
-            secure_pwd = auth_utils.hash_passwd(random_secret)
+            secure_pwd = await auth_utils.hash_passwd_async(random_secret)
             user_record = models.User(username=user_name, email=user_email, hashed_password=secure_pwd)
             db_session.add(user_record)
-            db_session.commit()
-            db_session.refresh(user_record)
+            await db_session.flush()
+            db_session.add(models.UserTaskStats(user_id=user_record.id))
+            await db_session.commit()
             
         token_expiry = timedelta(minutes=auth_utils.TOKEN_EXPIRE_MINUTES)
         auth_token = auth_utils.generate_access_token(
@@ -1,17 +1,27 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-import requests
 import os
+import json
 import auth as auth_utils
 import models
+from llm_client import llm_client, LLMError, LLMUnavailable
 
 router = APIRouter(prefix="/chat", tags=["Chat"])
 
+CHAT_TIMEOUT_SECONDS = float(os.getenv("CHAT_TIMEOUT_SECONDS", "20"))
+
 class ChatRequest(BaseModel):
     message: str
 
+def build_chat_messages(username: str, message: str):
+    return [
+        {"role": "system", "content": f"You are the AI assistant for Primetrade Task Manager. You must ONLY answer questions directly related to task management, productivity, or using this specific application. If the user asks about anything else (e.g. general knowledge, coding unrelated to the app, weather), politely refuse and guide them back to task management topics. The user is {username}."},
+        {"role": "user", "content": message}
+    ]
+
 @router.post("/ask")
-def ask_assistant(
+async def ask_assistant(
     request: ChatRequest,
     current_user: models.User = Depends(auth_utils.retrieve_current_user)
 ):
@@ -20,25 +30,55 @@ def ask_assistant(
         raise HTTPException(status_code=500, detail="Chat service not configured (API Key missing)")
 
     try:
-        response = requests.post(
-            url="https://openrouter.ai/api/v1/chat/completions",
-            headers={
-                "Authorization": f"Bearer {openrouter_key}",
-                "Content-Type": "application/json",
-                # "HTTP-Referer": "http://localhost:5173", # Optional
-                # "X-Title": "Primetrade Task Manager", # Optional
-            },
-            json={
-                "model": "openai/gpt-3.5-turbo", # Use a cheap/standard model or allow config
-                "messages": [
-                    {"role": "system", "content": f"You are the AI assistant for Primetrade Task Manager. You must ONLY answer questions directly related to task management, productivity, or using this specific application. If the user asks about anything else (e.g. general knowledge, coding unrelated to the app, weather), politely refuse and guide them back to task management topics. The user is {current_user.username}."},
-                    {"role": "user", "content": request.message}
-                ]
-            }
+        reply = await llm_client.chat_completion(
+            build_chat_messages(current_user.username, request.message),
+            timeout=CHAT_TIMEOUT_SECONDS
         )
-        response.raise_for_status()
-        data = response.json()
-        return {"response": data['choices'][0]['message']['content']}
+        return {"response": reply}
+    except LLMUnavailable as e:
+        print(f"Chat Error: {e}")
+        raise HTTPException(status_code=503, detail="AI assistant is temporarily unavailable")
     except Exception as e:
         print(f"Chat Error: {e}")
         raise HTTPException(status_code=500, detail="Failed to get response from AI assistant")
+
+def sse_event(payload, event: str = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(payload)}\n\n"
+
+@router.post("/ask/stream")
+async def stream_assistant_reply(
+    request: ChatRequest,
+    http_request: Request,
+    current_user: models.User = Depends(auth_utils.retrieve_current_user)
+):
+    """Relay the assistant reply as Server-Sent Events while the upstream generates it."""
+    openrouter_key = os.getenv("OPENROUTER_API_KEY")
+    if not openrouter_key:
+        raise HTTPException(status_code=500, detail="Chat service not configured (API Key missing)")
+
+    chat_messages = build_chat_messages(current_user.username, request.message)
+
+    async def relay_tokens():
+        token_stream = llm_client.stream_chat_completion(chat_messages, timeout=CHAT_TIMEOUT_SECONDS)
+        try:
+            async for token in token_stream:
+                if await http_request.is_disconnected():
+                    break
+                yield sse_event({"delta": token})
+            yield "data: [DONE]\n\n"
+        except LLMUnavailable as e:
+            print(f"Chat Error: {e}")
+            yield sse_event({"detail": "AI assistant is temporarily unavailable"}, event="error")
+        except LLMError as e:
+            print(f"Chat Error: {e}")
+            yield sse_event({"detail": "Failed to get response from AI assistant"}, event="error")
+        finally:
+            # Closing the generator closes the upstream response
+            await token_stream.aclose()
+
+    return StreamingResponse(
+        relay_tokens(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
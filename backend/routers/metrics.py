@@ -0,0 +1,72 @@
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import PlainTextResponse
+from typing import Optional
+import anyio.to_thread
+import os
+import metrics
+from metrics import ScrapedMetric, registry
+from connection_manager import manager
+from database import pool_stats
+from read_replicas import replica_router
+from password_hashing import password_pool
+from avatar_images import avatar_pool
+from llm_client import llm_client
+
+# When set, scrapers must send "Authorization: Bearer <token>"
+METRICS_BEARER_TOKEN = os.getenv("METRICS_BEARER_TOKEN")
+
+router = APIRouter(tags=["Metrics"])
+
+requests_in_progress = registry.register(ScrapedMetric(
+    "http_requests_in_progress", "HTTP requests currently being served."))
+threadpool_busy = registry.register(ScrapedMetric(
+    "threadpool_busy_threads", "Worker threads in use by sync endpoints, dependencies and to_thread calls."))
+threadpool_size = registry.register(ScrapedMetric(
+    "threadpool_max_threads", "Size of the worker thread pool; busy == max means calls are queueing."))
+process_pool_pending = registry.register(ScrapedMetric(
+    "process_pool_pending", "Jobs submitted to a CPU worker pool and not finished.", label_names=("pool",)))
+process_pool_max_pending = registry.register(ScrapedMetric(
+    "process_pool_max_pending", "Pending jobs at which a CPU worker pool starts rejecting work.", label_names=("pool",)))
+websocket_connections = registry.register(ScrapedMetric(
+    "websocket_connections", "Open WebSocket connections on this worker."))
+websocket_users = registry.register(ScrapedMetric(
+    "websocket_connected_users", "Users with at least one open WebSocket on this worker."))
+db_pool_checked_out = registry.register(ScrapedMetric(
+    "db_pool_checked_out_connections", "Connections currently checked out of a DB pool.", label_names=("pool",)))
+db_pool_size = registry.register(ScrapedMetric(
+    "db_pool_size", "Configured size of a DB pool (overflow not included).", label_names=("pool",)))
+db_pool_timeouts = registry.register(ScrapedMetric(
+    "db_pool_checkout_timeouts_total", "Checkouts that gave up waiting for a DB connection.", "counter", ("pool",)))
+llm_breaker_open = registry.register(ScrapedMetric(
+    "llm_circuit_breaker_open", "1 while the LLM circuit breaker fails calls fast (open or half-open)."))
+
+def collect_scraped_metrics():
+    requests_in_progress.set_values([((), metrics.requests_in_progress)])
+
+    thread_limiter = anyio.to_thread.current_default_thread_limiter()
+    threadpool_busy.set_values([((), thread_limiter.borrowed_tokens)])
+    threadpool_size.set_values([((), thread_limiter.total_tokens)])
+
+    worker_pools = {"password": password_pool, "avatar": avatar_pool}
+    process_pool_pending.set_values([((name,), pool.pending) for name, pool in worker_pools.items()])
+    process_pool_max_pending.set_values([((name,), pool.max_pending) for name, pool in worker_pools.items()])
+
+    websocket_connections.set_values([((), sum(len(clients) for clients in manager.active_connections.values()))])
+    websocket_users.set_values([((), len(manager.active_connections))])
+
+    db_pools = dict(pool_stats())
+    db_pools.update(replica_router.stats()["pools"])
+    # Pools without a QueuePool (e.g. in-memory SQLite) only report their class name
+    sized_pools = {name: stats for name, stats in db_pools.items() if "checked_out" in stats}
+    db_pool_checked_out.set_values([((name,), stats["checked_out"]) for name, stats in sized_pools.items()])
+    db_pool_size.set_values([((name,), stats["size"]) for name, stats in sized_pools.items()])
+    db_pool_timeouts.set_values([((name,), stats["timeouts"]) for name, stats in sized_pools.items()])
+
+    llm_breaker_open.set_values([((), 0 if llm_client.breaker.state == "closed" else 1)])
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def export_metrics(authorization: Optional[str] = Header(None)):
+    if METRICS_BEARER_TOKEN and authorization != f"Bearer {METRICS_BEARER_TOKEN}":
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    collect_scraped_metrics()
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
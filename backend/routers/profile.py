@@ -1,35 +1,45 @@
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
-from sqlalchemy.orm import Session
-from database import get_database_session
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_database_session
 from auth import retrieve_current_user
 from models import User
 from schemas import UserProfile, UserProfileUpdate
-import os
-import shutil
+from user_cache import user_cache
+from read_replicas import replica_router, retrieve_current_reader
+from avatar_images import (
+    AVATAR_SIZES, AVATAR_URL_PREFIX, AvatarPoolBusy, InvalidAvatarImage,
+    render_avatar, stale_avatar_files,
+)
 from pathlib import Path
+import anyio
+import uuid
 
 router = APIRouter(prefix="/profile", tags=["Profile"])
 
 AVATAR_DIR = Path("uploads/avatars")
 AVATAR_DIR.mkdir(parents=True, exist_ok=True)
+UPLOAD_TMP_DIR = Path("uploads/tmp")
+UPLOAD_TMP_DIR.mkdir(parents=True, exist_ok=True)
+AVATAR_MAX_BYTES = 5 * 1024 * 1024
 
 @router.get("/me", response_model=UserProfile)
-def retrieve_profile_info(active_user: User = Depends(retrieve_current_user)):
+async def retrieve_profile_info(active_user: User = Depends(retrieve_current_reader)):
     return active_user
 
 @router.put("/me", response_model=UserProfile)
-def modify_profile_info(
+async def modify_profile_info(
     profile_data: UserProfileUpdate,
     active_user: User = Depends(retrieve_current_user),
-    db_session: Session = Depends(get_database_session)
+    db_session: AsyncSession = Depends(get_async_database_session)
 ):
     updates = profile_data.model_dump(exclude_unset=True)
     
     for key, val in updates.items():
         setattr(active_user, key, val)
     
-    db_session.commit()
-    db_session.refresh(active_user)
+    await db_session.commit()
+    user_cache.invalidate(active_user.username)
+    replica_router.note_write(active_user.username)
     
     return active_user
 
@@ -37,7 +47,7 @@ def modify_profile_info(
 async def process_avatar_upload(
     image_file: UploadFile = File(...),
     active_user: User = Depends(retrieve_current_user),
-    db_session: Session = Depends(get_database_session)
+    db_session: AsyncSession = Depends(get_async_database_session)
 ):
     valid_formats = ["image/jpeg", "image/png", "image/jpg", "image/webp"]
     if image_file.content_type not in valid_formats:
@@ -48,24 +58,40 @@ async def process_avatar_upload(
     
     size_counter = 0
     read_chunk = 1024 * 1024
-    temp_filename = f"temp_{active_user.id}_{image_file.filename}"
+    # Never build paths from the client's filename
+    temp_path = UPLOAD_TMP_DIR / f"avatar_{active_user.id}_{uuid.uuid4().hex}"
+    avatar_stem = f"user_{active_user.id}"
     
-    with open(temp_filename, "wb") as f_out:
-        while data_chunk := await image_file.read(read_chunk):
-            size_counter += len(data_chunk)
-            if size_counter > 5 * 1024 * 1024:
-                os.remove(temp_filename)
-                raise HTTPException(status_code=400, detail="File too large. Maximum size is 5MB.")
-            f_out.write(data_chunk)
-    
-    ext = image_file.filename.split(".")[-1]
-    final_name = f"user_{active_user.id}.{ext}"
-    dest_path = AVATAR_DIR / final_name
+    try:
+        # anyio runs the file writes in a worker thread, keeping the event loop free
+        async with await anyio.open_file(temp_path, "wb") as f_out:
+            while data_chunk := await image_file.read(read_chunk):
+                size_counter += len(data_chunk)
+                if size_counter > AVATAR_MAX_BYTES:
+                    raise HTTPException(status_code=400, detail="File too large. Maximum size is 5MB.")
+                await f_out.write(data_chunk)
+        
+        rendered_files = await render_avatar(str(temp_path), str(AVATAR_DIR), avatar_stem)
+    except InvalidAvatarImage:
+        raise HTTPException(status_code=400, detail="Invalid image. Only JPEG, PNG, and WebP images are allowed.")
+    except AvatarPoolBusy:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Image processing is busy, please retry shortly",
+            headers={"Retry-After": "1"},
+        )
+    finally:
+        await anyio.Path(temp_path).unlink(missing_ok=True)
     
-    shutil.move(temp_filename, dest_path)
+    previous_avatar_url = active_user.avatar_url
+    active_user.avatar_url = AVATAR_URL_PREFIX + rendered_files[max(AVATAR_SIZES)]
+    await db_session.commit()
+    user_cache.invalidate(active_user.username)
+    replica_router.note_write(active_user.username)
     
-    active_user.avatar_url = f"/uploads/avatars/{final_name}"
-    db_session.commit()
-    db_session.refresh(active_user)
+    # The old URLs are immutable and never reused, so their files can go as soon as the new avatar is saved
+    for stale_file in stale_avatar_files(previous_avatar_url, avatar_stem):
+        if stale_file not in rendered_files.values():
+            await anyio.Path(AVATAR_DIR / stale_file).unlink(missing_ok=True)
     
     return active_user
@@ -0,0 +1,36 @@
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import PlainTextResponse
+from typing import Optional
+import os
+from request_profiler import profile_store
+
+# When set, callers must send "Authorization: Bearer <token>"; only mount this router in debug setups
+PROFILING_ADMIN_TOKEN = os.getenv("PROFILING_ADMIN_TOKEN")
+
+router = APIRouter(prefix="/debug/profiles", tags=["Profiling"])
+
+def check_admin_token(authorization: Optional[str]):
+    if PROFILING_ADMIN_TOKEN and authorization != f"Bearer {PROFILING_ADMIN_TOKEN}":
+        raise HTTPException(status_code=401, detail="Invalid profiling token")
+
+def find_profile(profile_id: int):
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found or already evicted")
+    return profile
+
+@router.get("/", include_in_schema=False)
+async def list_profiles(authorization: Optional[str] = Header(None)):
+    check_admin_token(authorization)
+    return [profile.summary() for profile in profile_store.recent()]
+
+@router.get("/{profile_id}", include_in_schema=False)
+async def get_profile(profile_id: int, authorization: Optional[str] = Header(None)):
+    check_admin_token(authorization)
+    return find_profile(profile_id).details()
+
+@router.get("/{profile_id}/collapsed", response_class=PlainTextResponse, include_in_schema=False)
+async def get_profile_flame(profile_id: int, authorization: Optional[str] = Header(None)):
+    """Collapsed stacks, one "frame;frame;frame count" line each: feed to flamegraph.pl or speedscope."""
+    check_admin_token(authorization)
+    return PlainTextResponse(find_profile(profile_id).collapsed())
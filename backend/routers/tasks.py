@@ -1,83 +1,359 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
-import models, schemas, database
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from pydantic import ValidationError
+from typing import List, Optional
+import models, schemas, database, analytics_rollup, task_search
 from connection_manager import manager
+from read_replicas import replica_router, get_read_database_session, retrieve_current_reader
+from conditional_get import load_change_version, weak_etag, etag_matches, cache_headers, not_modified
 import auth as auth_utils
 import datetime
+import base64
+import json
+import os
+
+TASKS_BULK_MAX_OPERATIONS = int(os.getenv("TASKS_BULK_MAX_OPERATIONS", "500"))
+# Ranked results are paged by offset; past this depth a query should be refined instead
+TASK_SEARCH_MAX_RESULTS = int(os.getenv("TASK_SEARCH_MAX_RESULTS", "1000"))
 
 router = APIRouter(
     prefix="/tasks",
     tags=["tasks"],
 )
 
+def serialize_task_payload(task_record: models.Task):
+    return schemas.Task.model_validate(task_record).model_dump(mode="json")
+
+def owned_task(task_id: int, user_id: int):
+    return select(models.Task).where(models.Task.id == task_id, models.Task.user_id == user_id)
+
+def apply_status_transition(task_record: models.Task, update_dict: dict):
+    """Stamp started_at/completed_at for a status change before the update is applied."""
+    if 'status' not in update_dict:
+        return
+    new_status_val = update_dict['status']
+    previous_status = task_record.status
+    
+    if previous_status == 'pending' and new_status_val == 'in_progress':
+        task_record.started_at = datetime.datetime.utcnow()
+    
+    if new_status_val == 'completed' and previous_status != 'completed':
+        task_record.completed_at = datetime.datetime.utcnow()
+        if not task_record.started_at:
+            task_record.started_at = task_record.created_at
+
+def describe_validation_error(error: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" for err in error.errors())
+
+def encode_task_cursor(task_record: models.Task) -> str:
+    raw_cursor = json.dumps([task_record.created_at.isoformat(), task_record.id])
+    return base64.urlsafe_b64encode(raw_cursor.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_task_cursor(cursor: str):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at_raw, task_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return datetime.datetime.fromisoformat(created_at_raw), int(task_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 @router.get("/", response_model=List[schemas.Task])
-def retrieve_user_tasks(
-    skip: int = 0, 
-    limit: int = 100, 
-    db_session: Session = Depends(database.get_database_session), 
-    active_user: models.User = Depends(auth_utils.retrieve_current_user)
+async def retrieve_user_tasks(
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500),
+    status: Optional[str] = None,
+    priority: Optional[str] = None,
+    due_after: Optional[datetime.datetime] = None,
+    due_before: Optional[datetime.datetime] = None,
+    title_prefix: Optional[str] = None,
+    db_session: AsyncSession = Depends(get_read_database_session), 
+    active_user: models.User = Depends(retrieve_current_reader)
 ):
-    user_tasks = db_session.query(models.Task).filter(models.Task.user_id == active_user.id).offset(skip).limit(limit).all()
+    """Page through the user's tasks in (created_at, id) order.
+
+    Pass the X-Next-Cursor header of one page as ``cursor`` to fetch the next;
+    the header is absent on the last page. Responses carry a weak ETag that
+    only changes when one of the user's tasks does.
+    """
+    # Read the version before the tasks: a write in between then yields an older ETag, never a newer one
+    change_version = await load_change_version(db_session, active_user.id)
+    if change_version is not None:
+        etag = weak_etag("tasks", active_user.id, change_version, sorted(request.query_params.multi_items()))
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return not_modified(etag)
+        response.headers.update(cache_headers(etag))
+
+    task_query = select(models.Task).where(models.Task.user_id == active_user.id)
+
+    if status:
+        task_query = task_query.where(models.Task.status == status)
+    if priority:
+        task_query = task_query.where(models.Task.priority == priority)
+    if due_after:
+        task_query = task_query.where(models.Task.due_date >= due_after)
+    if due_before:
+        task_query = task_query.where(models.Task.due_date < due_before)
+    if title_prefix:
+        escaped_prefix = title_prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        task_query = task_query.where(models.Task.title.like(f"{escaped_prefix}%", escape="\\"))
+
+    if cursor:
+        after_created_at, after_id = decode_task_cursor(cursor)
+        task_query = task_query.where(or_(
+            models.Task.created_at > after_created_at,
+            and_(models.Task.created_at == after_created_at, models.Task.id > after_id)
+        ))
+
+    # Fetch one extra row to learn whether another page exists
+    user_tasks = (await db_session.execute(
+        task_query.order_by(models.Task.created_at, models.Task.id).limit(limit + 1)
+    )).scalars().all()
+    if len(user_tasks) > limit:
+        user_tasks = user_tasks[:limit]
+        response.headers["X-Next-Cursor"] = encode_task_cursor(user_tasks[-1])
     return user_tasks
 
+@router.get("/summary", response_model=schemas.TaskSummary)
+async def summarize_user_tasks(
+    db_session: AsyncSession = Depends(get_read_database_session),
+    active_user: models.User = Depends(retrieve_current_reader)
+):
+    """Task counts by status for the dashboard cards, without listing the tasks."""
+    stats = await db_session.get(models.UserTaskStats, active_user.id)
+    if stats is not None:
+        return {
+            "total": stats.total_tasks,
+            "completed": stats.completed_tasks,
+            "in_progress": stats.in_progress_tasks,
+            "pending": stats.pending_tasks,
+        }
+    # Not backfilled yet: count the tasks directly
+    status_counts = dict((await db_session.execute(
+        select(models.Task.status, func.count(models.Task.id))
+        .where(models.Task.user_id == active_user.id)
+        .group_by(models.Task.status)
+    )).all())
+    return {
+        "total": sum(status_counts.values()),
+        "completed": status_counts.get("completed", 0),
+        "in_progress": status_counts.get("in_progress", 0),
+        "pending": status_counts.get("pending", 0),
+    }
+
+def encode_search_cursor(offset: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps({"offset": offset}).encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_search_cursor(cursor: str) -> int:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        offset = int(json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))["offset"])
+    except (ValueError, TypeError, KeyError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not 0 <= offset < TASK_SEARCH_MAX_RESULTS:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return offset
+
+@router.get("/search", response_model=List[schemas.Task])
+async def search_user_tasks(
+    request: Request,
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=200),
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    db_session: AsyncSession = Depends(get_read_database_session),
+    active_user: models.User = Depends(retrieve_current_reader)
+):
+    """Full-text search over the user's task titles and descriptions, best match first.
+
+    Every word must match, as a whole word or a prefix. Paged like the task
+    list: pass the X-Next-Cursor header back as ``cursor``.
+    """
+    terms = task_search.search_terms(q)
+    if not terms:
+        raise HTTPException(status_code=400, detail="Search query must contain a letter or digit")
+    offset = decode_search_cursor(cursor) if cursor else 0
+
+    change_version = await load_change_version(db_session, active_user.id)
+    if change_version is not None:
+        etag = weak_etag("search", active_user.id, change_version, sorted(request.query_params.multi_items()))
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return not_modified(etag)
+        response.headers.update(cache_headers(etag))
+
+    page_size = min(limit, TASK_SEARCH_MAX_RESULTS - offset)
+    search_query = task_search.search_statement(db_session.bind.dialect.name, active_user.id, terms)
+    matched_tasks = (await db_session.execute(search_query.offset(offset).limit(page_size + 1))).scalars().all()
+    if len(matched_tasks) > page_size:
+        matched_tasks = matched_tasks[:page_size]
+        if offset + page_size < TASK_SEARCH_MAX_RESULTS:
+            response.headers["X-Next-Cursor"] = encode_search_cursor(offset + page_size)
+    return matched_tasks
+
 @router.post("/", response_model=schemas.Task)
 async def add_new_task(
     task_data: schemas.TaskCreate, 
-    db_session: Session = Depends(database.get_database_session), 
+    db_session: AsyncSession = Depends(database.get_async_database_session), 
     active_user: models.User = Depends(auth_utils.retrieve_current_user)
 ):
     new_task_entry = models.Task(**task_data.model_dump(), user_id=active_user.id)
     db_session.add(new_task_entry)
-    db_session.commit()
-    db_session.refresh(new_task_entry)
-    await manager.broadcast("task_update")
+    await db_session.flush()
+    await db_session.run_sync(analytics_rollup.apply_task_change, active_user.id, None, analytics_rollup.snapshot_task(new_task_entry))
+    await db_session.commit()
+    replica_router.note_write(active_user.username)
+    await manager.publish_task_event(active_user.id, "created", serialize_task_payload(new_task_entry))
     return new_task_entry
 
+@router.post("/bulk", response_model=schemas.TaskBulkResponse)
+async def apply_bulk_task_operations(
+    bulk_request: schemas.TaskBulkRequest,
+    db_session: AsyncSession = Depends(database.get_async_database_session), 
+    active_user: models.User = Depends(auth_utils.retrieve_current_user)
+):
+    """Apply mixed create/update/delete operations in one transaction.
+
+    Each operation gets its own result. Failed items are skipped, unless
+    ``atomic`` is set, in which case any failure rejects the whole batch.
+    Subscribers receive a single task_batch_update event.
+    """
+    operations = bulk_request.operations
+    if not operations:
+        raise HTTPException(status_code=400, detail="No operations given")
+    if len(operations) > TASKS_BULK_MAX_OPERATIONS:
+        raise HTTPException(status_code=413, detail=f"At most {TASKS_BULK_MAX_OPERATIONS} operations per request")
+
+    # One SELECT for every task the batch updates or deletes
+    referenced_ids = {op.id for op in operations if op.op != "create" and op.id is not None}
+    owned_tasks = {}
+    if referenced_ids:
+        owned_tasks = {
+            task_record.id: task_record
+            for task_record in (await db_session.execute(select(models.Task).where(
+                models.Task.user_id == active_user.id, models.Task.id.in_(referenced_ids)
+            ))).scalars()
+        }
+
+    results = []
+    rollup_changes = []
+    applied_records = []
+    deleted_payloads = {}
+
+    for index, operation in enumerate(operations):
+        result = schemas.TaskBulkResult(index=index, op=operation.op, ok=False, id=operation.id)
+        results.append(result)
+
+        if operation.op == "create":
+            try:
+                task_data = schemas.TaskCreate.model_validate(operation.task or {})
+            except ValidationError as e:
+                result.detail = describe_validation_error(e)
+                continue
+            new_task_entry = models.Task(**task_data.model_dump(), user_id=active_user.id)
+            db_session.add(new_task_entry)
+            applied_records.append((result, new_task_entry))
+            continue
+
+        task_record = owned_tasks.get(operation.id)
+        if task_record is None:
+            result.detail = "Task not found" if operation.id is not None else "Missing task id"
+            continue
+
+        if operation.op == "update":
+            try:
+                update_dict = schemas.TaskUpdate.model_validate(operation.task or {}).model_dump(exclude_unset=True)
+            except ValidationError as e:
+                result.detail = describe_validation_error(e)
+                continue
+            previous_snapshot = analytics_rollup.snapshot_task(task_record)
+            apply_status_transition(task_record, update_dict)
+            for key, val in update_dict.items():
+                setattr(task_record, key, val)
+            rollup_changes.append((previous_snapshot, analytics_rollup.snapshot_task(task_record)))
+            applied_records.append((result, task_record))
+        else:
+            deleted_payloads[task_record.id] = serialize_task_payload(task_record)
+            rollup_changes.append((analytics_rollup.snapshot_task(task_record), None))
+            await db_session.delete(task_record)
+            # Later operations on the same id see it as gone
+            del owned_tasks[task_record.id]
+            result.ok = True
+
+    failed = sum(1 for result in results if result.detail)
+    if failed and bulk_request.atomic:
+        await db_session.rollback()
+        raise HTTPException(status_code=422, detail=[
+            {"index": result.index, "op": result.op, "detail": result.detail} for result in results if result.detail
+        ])
+
+    # Creates are inserted in one flush; created_at and ids are known afterwards
+    await db_session.flush()
+    for result, task_record in applied_records:
+        if result.op == "create":
+            rollup_changes.append((None, analytics_rollup.snapshot_task(task_record)))
+    if rollup_changes:
+        await db_session.run_sync(analytics_rollup.apply_task_changes, active_user.id, rollup_changes)
+
+    # Serialize before commit: commit expires every row and reloading them would cost a SELECT each
+    event_changes = {}
+    for result, task_record in applied_records:
+        result.ok = True
+        result.id = task_record.id
+        if task_record.id in deleted_payloads:
+            continue
+        result.task = schemas.Task.model_validate(task_record)
+        action = "created" if result.op == "create" else "updated"
+        event_changes[task_record.id] = {"action": action, "task": result.task.model_dump(mode="json")}
+    for task_id, deleted_payload in deleted_payloads.items():
+        event_changes[task_id] = {"action": "deleted", "task": deleted_payload}
+
+    await db_session.commit()
+    replica_router.note_write(active_user.username)
+    if event_changes:
+        await manager.publish_task_batch_event(active_user.id, list(event_changes.values()))
+    return schemas.TaskBulkResponse(applied=len(results) - failed, failed=failed, results=results)
+
 @router.put("/{task_id}", response_model=schemas.Task)
 async def modify_existing_task(
     task_id: int, 
     task_update: schemas.TaskUpdate, 
-    db_session: Session = Depends(database.get_database_session), 
+    db_session: AsyncSession = Depends(database.get_async_database_session), 
     active_user: models.User = Depends(auth_utils.retrieve_current_user)
 ):
-    existing_task = db_session.query(models.Task).filter(models.Task.id == task_id, models.Task.user_id == active_user.id).first()
+    existing_task = (await db_session.execute(owned_task(task_id, active_user.id))).scalars().first()
     if not existing_task:
         raise HTTPException(status_code=404, detail="Task not found")
     
     update_dict = task_update.model_dump(exclude_unset=True)
-    
-    if 'status' in update_dict:
-        new_status_val = update_dict['status']
-        previous_status = existing_task.status
-        
-        if previous_status == 'pending' and new_status_val == 'in_progress':
-            existing_task.started_at = datetime.datetime.utcnow()
-        
-        if new_status_val == 'completed' and previous_status != 'completed':
-            existing_task.completed_at = datetime.datetime.utcnow()
-            if not existing_task.started_at:
-                existing_task.started_at = existing_task.created_at
+    previous_snapshot = analytics_rollup.snapshot_task(existing_task)
+    apply_status_transition(existing_task, update_dict)
             
     for key, val in update_dict.items():
         setattr(existing_task, key, val)
     
-    db_session.commit()
-    db_session.refresh(existing_task)
-    await manager.broadcast("task_update")
+    await db_session.run_sync(analytics_rollup.apply_task_change, active_user.id, previous_snapshot, analytics_rollup.snapshot_task(existing_task))
+    await db_session.commit()
+    replica_router.note_write(active_user.username)
+    await manager.publish_task_event(active_user.id, "updated", serialize_task_payload(existing_task))
     return existing_task
 
 @router.delete("/{task_id}")
 async def remove_task(
     task_id: int, 
-    db_session: Session = Depends(database.get_database_session), 
+    db_session: AsyncSession = Depends(database.get_async_database_session), 
     active_user: models.User = Depends(auth_utils.retrieve_current_user)
 ):
-    task_to_delete = db_session.query(models.Task).filter(models.Task.id == task_id, models.Task.user_id == active_user.id).first()
+    task_to_delete = (await db_session.execute(owned_task(task_id, active_user.id))).scalars().first()
     if not task_to_delete:
         raise HTTPException(status_code=404, detail="Task not found")
     
-    db_session.delete(task_to_delete)
-    db_session.commit()
-    await manager.broadcast("task_update")
+    deleted_payload = serialize_task_payload(task_to_delete)
+    deleted_snapshot = analytics_rollup.snapshot_task(task_to_delete)
+    await db_session.delete(task_to_delete)
+    await db_session.run_sync(analytics_rollup.apply_task_change, active_user.id, deleted_snapshot, None)
+    await db_session.commit()
+    replica_router.note_write(active_user.username)
+    await manager.publish_task_event(active_user.id, "deleted", deleted_payload)
     return {"detail": "Task deleted successfully"}
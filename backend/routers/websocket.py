@@ -1,17 +1,26 @@
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Query, status
+from typing import Optional
 from connection_manager import manager
+import auth as auth_utils
 
 router = APIRouter(tags=["websockets"])
 
 @router.websocket("/ws/{client_id}")
-async def websocket_endpoint(websocket: WebSocket, client_id: int):
-    await manager.connect(websocket)
+async def websocket_endpoint(websocket: WebSocket, client_id: str, token: Optional[str] = Query(None)):
+    active_user = await auth_utils.retrieve_socket_user(token)
+    if active_user is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    user_id = active_user.id
+    await manager.connect(websocket, user_id)
     try:
         while True:
             data = await websocket.receive_text()
-            # Echo or process if needed, for now mainly for broadcasting updates
+            # Echo or process if needed, for now mainly for pushing task deltas
             # await manager.send_personal_message(f"You wrote: {data}", websocket)
             pass 
     except WebSocketDisconnect:
-        manager.disconnect(websocket)
-        # await manager.broadcast(f"Client #{client_id} left the chat")
+        pass
+    finally:
+        manager.disconnect(websocket, user_id)
@@ -1,8 +1,22 @@
-from pydantic import BaseModel, EmailStr, field_validator
-from typing import Optional, List
+from pydantic import BaseModel, EmailStr, computed_field, field_validator
+from typing import Any, Dict, Optional, List
 from datetime import datetime
+from avatar_images import variant_urls
 import re
 
+TASK_STATUSES = ['pending', 'in_progress', 'completed']
+TASK_PRIORITIES = ['low', 'medium', 'high']
+
+def validate_task_status(v: str) -> str:
+    if v not in TASK_STATUSES:
+        raise ValueError(f'Status must be one of: {", ".join(TASK_STATUSES)}')
+    return v
+
+def validate_task_priority(v: str) -> str:
+    if v not in TASK_PRIORITIES:
+        raise ValueError(f'Priority must be one of: {", ".join(TASK_PRIORITIES)}')
+    return v
+
 class TaskBase(BaseModel):
     title: str
     description: str
@@ -13,18 +27,12 @@ class TaskBase(BaseModel):
     @field_validator('status')
     @classmethod
     def check_status_validity(cls, v: str) -> str:
-        valid_options = ['pending', 'in_progress', 'completed']
-        if v not in valid_options:
-            raise ValueError(f'Status must be one of: {", ".join(valid_options)}')
-        return v
+        return validate_task_status(v)
 
     @field_validator('priority')
     @classmethod
     def check_priority_validity(cls, v: str) -> str:
-        valid_options = ['low', 'medium', 'high']
-        if v not in valid_options:
-            raise ValueError(f'Priority must be one of: {", ".join(valid_options)}')
-        return v
+        return validate_task_priority(v)
 
 class TaskCreate(TaskBase):
     pass
@@ -36,6 +44,24 @@ class TaskUpdate(BaseModel):
     priority: Optional[str] = None
     due_date: Optional[datetime] = None
 
+    # Omitted fields stay unset; an explicit value must still make a valid Task
+    @field_validator('title', 'description')
+    @classmethod
+    def check_not_null(cls, v: Optional[str]) -> str:
+        if v is None:
+            raise ValueError('May not be null')
+        return v
+
+    @field_validator('status')
+    @classmethod
+    def check_status_validity(cls, v: Optional[str]) -> str:
+        return validate_task_status(v)
+
+    @field_validator('priority')
+    @classmethod
+    def check_priority_validity(cls, v: Optional[str]) -> str:
+        return validate_task_priority(v)
+
 class Task(TaskBase):
     id: int
     user_id: int
@@ -47,6 +73,42 @@ class Task(TaskBase):
     class Config:
         from_attributes = True
 
+class TaskSummary(BaseModel):
+    total: int
+    completed: int
+    in_progress: int
+    pending: int
+
+class TaskBulkOperation(BaseModel):
+    op: str
+    id: Optional[int] = None
+    task: Optional[Dict[str, Any]] = None
+
+    @field_validator('op')
+    @classmethod
+    def check_op_validity(cls, v: str) -> str:
+        valid_options = ['create', 'update', 'delete']
+        if v not in valid_options:
+            raise ValueError(f'Operation must be one of: {", ".join(valid_options)}')
+        return v
+
+class TaskBulkRequest(BaseModel):
+    operations: List[TaskBulkOperation]
+    atomic: bool = False
+
+class TaskBulkResult(BaseModel):
+    index: int
+    op: str
+    ok: bool
+    id: Optional[int] = None
+    task: Optional[Task] = None
+    detail: Optional[str] = None
+
+class TaskBulkResponse(BaseModel):
+    applied: int
+    failed: int
+    results: List[TaskBulkResult]
+
 class UserBase(BaseModel):
     username: str
     email: EmailStr
@@ -91,6 +153,12 @@ class UserProfile(BaseModel):
     created_at: datetime
     updated_at: Optional[datetime] = None
 
+    @computed_field
+    @property
+    def avatar_urls(self) -> Dict[str, str]:
+        """WebP thumbnail URL per pixel size; empty until a new avatar is uploaded."""
+        return variant_urls(self.avatar_url)
+
     class Config:
         from_attributes = True
 
@@ -0,0 +1,50 @@
+"""
+Per-request SQL statement budgets for the mutation endpoints.
+
+Statements are counted per request by metrics.instrument_engine (see
+metrics.current_request_db). Endpoints listed in STATEMENT_BUDGETS declare the
+most statements one call may need, and a request that goes over is logged.
+The check runs after the handler has committed, so it never changes the
+response; tests/test_statement_counts.py pins the exact counts instead.
+"""
+from metrics import request_db_usage
+
+# Worst cases: a cold user cache (one SELECT on users) and a removed duration
+# extreme that forces a rescan (a SELECT of the extremes, a scan of the user's
+# tasks and an UPDATE). Trend rows are upserted, so a new day costs nothing extra.
+#
+# POST /tasks/bulk is deliberately left out. A budget here is one fixed number
+# per route, but a bulk call's count grows with its batch: every created task
+# is its own INSERT (the ORM needs each new id), while updates and deletes share
+# one SELECT and one set of rollup writes. Any fixed number would either flag
+# every large batch or be too loose to catch an extra statement in a small one.
+# The batch size is capped by TASKS_BULK_MAX_OPERATIONS instead, and
+# tests/test_statement_counts.py pins the counts per operation type.
+STATEMENT_BUDGETS = {
+    ("POST", "/auth/register"): 3,
+    ("POST", "/tasks/"): 4,
+    ("PUT", "/tasks/{task_id}"): 8,
+    ("DELETE", "/tasks/{task_id}"): 8,
+    ("PUT", "/profile/me"): 2,
+    ("POST", "/profile/avatar"): 2,
+}
+
+class StatementBudgetMiddleware:
+    def __init__(self, app, budgets=STATEMENT_BUDGETS):
+        self.app = app
+        self.budgets = budgets
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with request_db_usage() as usage:
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                # The route is only known once the router has matched the request
+                route_path = getattr(scope.get("route"), "path", None)
+                budget = self.budgets.get((scope["method"], route_path))
+                if budget is not None and usage.statements > budget:
+                    print(f"DB statement budget exceeded: {scope['method']} {route_path} ran {usage.statements} statements (budget {budget})")
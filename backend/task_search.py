@@ -0,0 +1,54 @@
+"""
+Ranked full-text search over a user's tasks.
+
+Backed by the dialect's own inverted index (see TASK_SEARCH_DDL in models):
+MySQL FULLTEXT in boolean mode or SQLite FTS5 ranked with bm25. Every word
+of the query must match, and each word also matches as a prefix, so
+"rebal port" finds "Rebalance portfolio". Title hits outrank description
+hits on SQLite; MySQL scores both columns together.
+"""
+from sqlalchemy import column, literal_column, select, table
+from sqlalchemy.dialects.mysql import match
+from typing import List
+import re
+import models
+
+TASK_SEARCH_MAX_TERMS = 8
+# bm25 column weights for (title, description)
+TITLE_WEIGHT = 4.0
+DESCRIPTION_WEIGHT = 1.0
+
+# Index tokens are runs of letters and digits; everything else (quotes, operators) is dropped
+SEARCH_TERM_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+tasks_fts = table("tasks_fts", column("rowid"))
+
+def search_terms(query: str) -> List[str]:
+    terms = [term.lower() for term in SEARCH_TERM_PATTERN.findall(query) if term != "_"]
+    # De-duplicate while keeping order, then cap how many posting lists one query may touch
+    return list(dict.fromkeys(terms))[:TASK_SEARCH_MAX_TERMS]
+
+def sqlite_search(user_id: int, terms: List[str]):
+    match_expression = " ".join(f'"{term}"*' for term in terms)
+    rank = literal_column(f"bm25(tasks_fts, {TITLE_WEIGHT}, {DESCRIPTION_WEIGHT})")
+    return (
+        select(models.Task)
+        .join(tasks_fts, tasks_fts.c.rowid == models.Task.id)
+        .where(literal_column("tasks_fts").op("MATCH")(match_expression), models.Task.user_id == user_id)
+        # bm25 is lower for better matches
+        .order_by(rank, models.Task.id)
+    )
+
+def mysql_search(user_id: int, terms: List[str]):
+    relevance = match(models.Task.title, models.Task.description, against=" ".join(f"+{term}*" for term in terms)).in_boolean_mode()
+    return (
+        select(models.Task)
+        .where(relevance, models.Task.user_id == user_id)
+        .order_by(relevance.desc(), models.Task.id)
+    )
+
+def search_statement(dialect_name: str, user_id: int, terms: List[str]):
+    """SELECT of the user's tasks matching every term, best match first."""
+    if dialect_name == "sqlite":
+        return sqlite_search(user_id, terms)
+    return mysql_search(user_id, terms)
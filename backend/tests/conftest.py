@@ -0,0 +1,59 @@
+import os
+import sys
+import tempfile
+
+# database, auth and main read their settings at import time
+TEST_DIR = tempfile.mkdtemp(prefix="primetrade-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(TEST_DIR, 'test.db')}"
+os.environ.pop("ASYNC_DATABASE_URL", None)
+os.environ.pop("DATABASE_REPLICA_URLS", None)
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ["BCRYPT_ROUNDS"] = "4"
+os.environ.pop("OPENROUTER_API_KEY", None)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# main creates uploads/ relative to the working directory
+os.chdir(TEST_DIR)
+
+import itertools
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+import main
+
+_usernames = (f"user{index}" for index in itertools.count())
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+@pytest.fixture
+def auth_headers(client):
+    username = next(_usernames)
+    password = "Passw0rd!"
+    client.post("/auth/register", json={"username": username, "email": f"{username}@example.com", "password": password})
+    token = client.post("/auth/login", data={"username": username, "password": password}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    # Warm the user cache so counts do not depend on test order
+    client.get("/profile/me", headers=headers)
+    return headers
+
+class StatementLog:
+    def __init__(self):
+        self.statements = []
+
+    def record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def count(self, call):
+        """Run ``call`` and return its response with the number of statements it issued."""
+        self.statements.clear()
+        response = call()
+        return response, len(self.statements)
+
+@pytest.fixture(scope="session")
+def statement_log():
+    log = StatementLog()
+    for engine in main.instrumented_engines.values():
+        event.listen(engine, "after_cursor_execute", log.record)
+    return log
@@ -0,0 +1,89 @@
+"""
+Rollup writes for users and days that have no rollup row yet.
+
+Both the per-user stats row and the per-day trend rows are upserted, so a
+write that finds no row never races another writer into a duplicate key.
+"""
+from datetime import datetime, timedelta
+import itertools
+import pytest
+import analytics_rollup
+import models
+from database import Base, LocalSession, db_engine
+
+_usernames = (f"rollup{index}" for index in itertools.count())
+
+@pytest.fixture
+def db_session():
+    Base.metadata.create_all(bind=db_engine)
+    session = LocalSession()
+    try:
+        yield session
+    finally:
+        session.rollback()
+        session.close()
+
+@pytest.fixture
+def user_id(db_session):
+    username = next(_usernames)
+    user = models.User(username=username, email=f"{username}@example.com", hashed_password="unused")
+    db_session.add(user)
+    db_session.flush()
+    return user.id
+
+def add_task(db_session, user_id, created_at, completed_at=None):
+    task = models.Task(
+        user_id=user_id, title="Hedge exposure", status="completed" if completed_at else "pending", priority="high",
+        created_at=created_at, started_at=created_at if completed_at else None, completed_at=completed_at,
+    )
+    db_session.add(task)
+    db_session.flush()
+    return task
+
+def daily_counts(db_session, user_id):
+    Daily = models.UserDailyTaskStats
+    return {
+        row.day: (row.created_count, row.completed_count)
+        for row in db_session.query(Daily).filter(Daily.user_id == user_id)
+    }
+
+def test_first_write_seeds_missing_stats_row(db_session, user_id):
+    created_at = datetime(2026, 3, 2, 9, 30)
+    task = add_task(db_session, user_id, created_at)
+
+    analytics_rollup.apply_task_change(db_session, user_id, None, analytics_rollup.snapshot_task(task))
+
+    stats = db_session.get(models.UserTaskStats, user_id)
+    assert (stats.total_tasks, stats.pending_tasks, stats.change_version) == (1, 1, 1)
+    assert daily_counts(db_session, user_id) == {created_at.date(): (1, 0)}
+    assert analytics_rollup.check_user_rollup(db_session, user_id) == []
+
+def test_change_for_a_new_day_inserts_its_trend_row(db_session, user_id):
+    created_at = datetime(2026, 3, 2, 9, 30)
+    task = add_task(db_session, user_id, created_at)
+    analytics_rollup.rebuild_user_rollup(db_session, user_id)
+
+    before = analytics_rollup.snapshot_task(task)
+    task.status, task.started_at, task.completed_at = "completed", created_at, created_at + timedelta(days=1, hours=2)
+    second = add_task(db_session, user_id, created_at + timedelta(days=1))
+    analytics_rollup.apply_task_changes(db_session, user_id, [
+        (before, analytics_rollup.snapshot_task(task)),
+        (None, analytics_rollup.snapshot_task(second)),
+    ])
+
+    assert daily_counts(db_session, user_id) == {created_at.date(): (1, 0), created_at.date() + timedelta(days=1): (1, 1)}
+    assert analytics_rollup.check_user_rollup(db_session, user_id) == []
+
+def test_rebuild_over_existing_rows_updates_them(db_session, user_id):
+    created_at = datetime(2026, 3, 2, 9, 30)
+    add_task(db_session, user_id, created_at)
+    analytics_rollup.rebuild_user_rollup(db_session, user_id)
+    add_task(db_session, user_id, created_at, completed_at=created_at + timedelta(hours=3))
+
+    analytics_rollup.rebuild_user_rollup(db_session, user_id)
+
+    stats = db_session.get(models.UserTaskStats, user_id)
+    db_session.refresh(stats)
+    assert (stats.total_tasks, stats.completed_tasks, stats.change_version) == (2, 1, 2)
+    assert daily_counts(db_session, user_id) == {created_at.date(): (2, 1)}
+    assert analytics_rollup.check_user_rollup(db_session, user_id) == []
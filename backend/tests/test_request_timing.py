@@ -0,0 +1,48 @@
+"""
+Request timings and profiles stop when the response is sent, not when its
+background tasks finish.
+"""
+import time
+from fastapi import BackgroundTasks, FastAPI
+from fastapi.testclient import TestClient
+from metrics import MetricsMiddleware, http_request_duration
+from request_profiler import ProfileStore, RequestProfilerMiddleware
+
+BACKGROUND_SECONDS = 0.3
+
+def observed_seconds(route: str) -> float:
+    suffix = f'_sum{{method="GET",route="{route}"}} '
+    return next(float(line.rsplit(" ", 1)[1]) for line in http_request_duration.samples() if suffix in line)
+
+def app_with_background_task(finished):
+    app = FastAPI()
+
+    def slow_refresh():
+        time.sleep(BACKGROUND_SECONDS)
+        finished.append(True)
+
+    @app.get("/timing/background")
+    async def schedule_refresh(background_tasks: BackgroundTasks):
+        background_tasks.add_task(slow_refresh)
+        return {"ok": True}
+
+    return app
+
+def test_background_task_is_not_timed_as_part_of_the_request():
+    finished = []
+    with TestClient(MetricsMiddleware(app_with_background_task(finished))) as test_client:
+        assert test_client.get("/timing/background").status_code == 200
+
+    assert finished
+    assert observed_seconds("/timing/background") < BACKGROUND_SECONDS
+
+def test_background_task_is_not_part_of_the_profile():
+    finished = []
+    store = ProfileStore()
+    with TestClient(RequestProfilerMiddleware(app_with_background_task(finished), store=store)) as test_client:
+        response = test_client.get("/timing/background", headers={"X-Profile-Request": "1"})
+
+    profile = store.get(int(response.headers["X-Profile-Id"]))
+    assert finished
+    assert profile.status_code == 200
+    assert profile.wall_ms < BACKGROUND_SECONDS * 1000
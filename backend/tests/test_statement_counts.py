@@ -0,0 +1,111 @@
+"""
+Exact SQL statement counts of the registration, task and profile writes.
+
+Counts assume a warm user cache. A change that adds a round trip (a
+refresh(), a lazy load, an N+1 loop) fails here; if the extra statement
+is intended, update the expected count and STATEMENT_BUDGETS together.
+"""
+import io
+from PIL import Image
+from statement_budget import STATEMENT_BUDGETS
+from user_cache import user_cache
+
+def create_task(client, headers, **fields):
+    return client.post("/tasks/", json={"title": "Review order book", "description": "Check depth", **fields}, headers=headers)
+
+def bulk(client, headers, operations):
+    return client.post("/tasks/bulk", json={"operations": operations}, headers=headers)
+
+def assert_statements(method, route, response, count, expected):
+    assert response.status_code == 200, response.text
+    assert count == expected
+    assert count <= STATEMENT_BUDGETS[(method, route)]
+
+def test_register(client, statement_log):
+    # Duplicate check, the user row and the empty analytics rollup row
+    account = {"username": "counted", "email": "counted@example.com", "password": "Passw0rd!"}
+    response, count = statement_log.count(lambda: client.post("/auth/register", json=account))
+    assert_statements("POST", "/auth/register", response, count, 3)
+
+def test_create_task(client, auth_headers, statement_log):
+    # The trend row for today is upserted, so the first task of the day costs the same as the next
+    response, count = statement_log.count(lambda: create_task(client, auth_headers))
+    assert_statements("POST", "/tasks/", response, count, 3)
+
+    response, count = statement_log.count(lambda: create_task(client, auth_headers))
+    assert_statements("POST", "/tasks/", response, count, 3)
+
+def test_cold_user_cache_adds_one_select(client, auth_headers, statement_log):
+    create_task(client, auth_headers)
+    username = client.get("/profile/me", headers=auth_headers).json()["username"]
+    user_cache.invalidate(username)
+
+    response, count = statement_log.count(lambda: create_task(client, auth_headers))
+    assert_statements("POST", "/tasks/", response, count, 4)
+
+def test_update_task(client, auth_headers, statement_log):
+    task_id = create_task(client, auth_headers).json()["id"]
+
+    response, count = statement_log.count(lambda: client.put(f"/tasks/{task_id}", json={"title": "Rebalance"}, headers=auth_headers))
+    assert_statements("PUT", "/tasks/{task_id}", response, count, 3)
+
+    response, count = statement_log.count(lambda: client.put(f"/tasks/{task_id}", json={"status": "in_progress"}, headers=auth_headers))
+    assert_statements("PUT", "/tasks/{task_id}", response, count, 3)
+
+    # Completing adds the duration extremes and the completion trend counter
+    response, count = statement_log.count(lambda: client.put(f"/tasks/{task_id}", json={"status": "completed"}, headers=auth_headers))
+    assert_statements("PUT", "/tasks/{task_id}", response, count, 5)
+
+def test_delete_task(client, auth_headers, statement_log):
+    task_id = create_task(client, auth_headers).json()["id"]
+
+    response, count = statement_log.count(lambda: client.delete(f"/tasks/{task_id}", headers=auth_headers))
+    assert_statements("DELETE", "/tasks/{task_id}", response, count, 4)
+
+def test_delete_duration_extreme_rescans(client, auth_headers, statement_log):
+    task_id = create_task(client, auth_headers).json()["id"]
+    client.put(f"/tasks/{task_id}", json={"status": "in_progress"}, headers=auth_headers)
+    client.put(f"/tasks/{task_id}", json={"status": "completed"}, headers=auth_headers)
+
+    response, count = statement_log.count(lambda: client.delete(f"/tasks/{task_id}", headers=auth_headers))
+    assert_statements("DELETE", "/tasks/{task_id}", response, count, 7)
+
+def test_bulk_writes(client, auth_headers, statement_log):
+    # Not budgeted (see statement_budget.py): creates cost one INSERT each, updates and deletes a fixed amount
+    creates = [{"op": "create", "task": {"title": f"Leg {index}", "description": "Spread"}} for index in range(10)]
+    response, count = statement_log.count(lambda: bulk(client, auth_headers, creates))
+    assert response.status_code == 200 and response.json()["applied"] == 10
+    assert count == 2 + 10
+
+    task_ids = [result["id"] for result in response.json()["results"]]
+    updates = [{"op": "update", "id": task_id, "task": {"status": "completed"}} for task_id in task_ids]
+    response, count = statement_log.count(lambda: bulk(client, auth_headers, updates))
+    assert response.status_code == 200 and response.json()["applied"] == 10
+    assert count == 5
+
+    deletes = [{"op": "delete", "id": task_id} for task_id in task_ids]
+    response, count = statement_log.count(lambda: bulk(client, auth_headers, deletes))
+    assert response.status_code == 200 and response.json()["applied"] == 10
+    assert count == 7
+
+def test_update_profile(client, auth_headers, statement_log):
+    response, count = statement_log.count(lambda: client.put("/profile/me", json={"full_name": "Ada Trader"}, headers=auth_headers))
+    assert_statements("PUT", "/profile/me", response, count, 1)
+
+def test_upload_avatar(client, auth_headers, statement_log):
+    image_bytes = io.BytesIO()
+    Image.new("RGB", (400, 300), "teal").save(image_bytes, format="PNG")
+    upload = {"image_file": ("avatar.png", image_bytes.getvalue(), "image/png")}
+
+    response, count = statement_log.count(lambda: client.post("/profile/avatar", files=upload, headers=auth_headers))
+    assert_statements("POST", "/profile/avatar", response, count, 1)
+
+def test_budget_overrun_is_logged_without_changing_the_response(client, auth_headers, statement_log, monkeypatch, capsys):
+    monkeypatch.setitem(STATEMENT_BUDGETS, ("POST", "/tasks/"), 0)
+
+    response = create_task(client, auth_headers, title="Over budget")
+
+    assert response.status_code == 200
+    assert "DB statement budget exceeded: POST /tasks/" in capsys.readouterr().out
+    titles = [task["title"] for task in client.get("/tasks/", headers=auth_headers).json()]
+    assert "Over budget" in titles
@@ -0,0 +1,36 @@
+"""
+The dashboard's task reads: one filtered page at a time plus the status summary.
+"""
+
+def create_task(client, headers, title, status="pending"):
+    response = client.post("/tasks/", json={"title": title, "description": "Dashboard", "status": status}, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+def test_list_pages_with_server_side_filters(client, auth_headers):
+    for index in range(3):
+        create_task(client, auth_headers, f"Hedge {index}")
+    create_task(client, auth_headers, "Hedge done", status="completed")
+    create_task(client, auth_headers, "Rebalance")
+
+    first_page = client.get("/tasks/", params={"limit": 2, "status": "pending", "title_prefix": "Hedge"}, headers=auth_headers)
+    assert [task["title"] for task in first_page.json()] == ["Hedge 0", "Hedge 1"]
+
+    cursor = first_page.headers["X-Next-Cursor"]
+    last_page = client.get(
+        "/tasks/", params={"limit": 2, "status": "pending", "title_prefix": "Hedge", "cursor": cursor}, headers=auth_headers
+    )
+    assert [task["title"] for task in last_page.json()] == ["Hedge 2"]
+    assert "X-Next-Cursor" not in last_page.headers
+
+def test_summary_counts_every_task(client, auth_headers):
+    create_task(client, auth_headers, "Hedge")
+    create_task(client, auth_headers, "Rebalance", status="in_progress")
+    done = create_task(client, auth_headers, "Report", status="completed")
+    client.delete(f"/tasks/{done['id']}", headers=auth_headers)
+    create_task(client, auth_headers, "Review", status="completed")
+
+    response = client.get("/tasks/summary", headers=auth_headers)
+
+    assert response.status_code == 200
+    assert response.json() == {"total": 3, "completed": 1, "in_progress": 1, "pending": 1}
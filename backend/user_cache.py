@@ -0,0 +1,72 @@
+"""
+In-process cache of authenticated user rows.
+
+retrieve_current_user runs on every protected request; this cache lets it
+skip the users-table lookup for a recently seen user. Entries hold a column
+snapshot (not a live ORM object), expire after a TTL that never outlives
+the token they were loaded for, and are dropped explicitly whenever the
+user's row changes. The cache is per worker, so the TTL bounds how long
+another worker can serve a stale profile.
+"""
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+import os
+import threading
+import time
+
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+USER_CACHE_MAX_ENTRIES = int(os.getenv("USER_CACHE_MAX_ENTRIES", "10000"))
+
+def snapshot_user(user_record) -> Dict[str, Any]:
+    return {column.key: getattr(user_record, column.key) for column in user_record.__table__.columns}
+
+class UserIdentityCache:
+    def __init__(self, max_entries: int = USER_CACHE_MAX_ENTRIES, ttl_seconds: float = USER_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, username: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is None or entry[0] <= time.time():
+                if entry is not None:
+                    del self._entries[username]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(username)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, username: str, user_snapshot: Dict[str, Any], token_expires_at: Optional[float] = None):
+        expires_at = time.time() + self.ttl_seconds
+        if token_expires_at is not None:
+            expires_at = min(expires_at, token_expires_at)
+        with self._lock:
+            self._entries[username] = (expires_at, user_snapshot)
+            self._entries.move_to_end(username)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, username: str):
+        with self._lock:
+            self._entries.pop(username, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "size": len(self._entries),
+            }
+
+user_cache = UserIdentityCache()
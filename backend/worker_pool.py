@@ -0,0 +1,49 @@
+"""
+Size-limited process pool for CPU-bound work off the event loop.
+
+Used for bcrypt (password_hashing) and avatar rendering (avatar_images).
+Workers are spawned lazily; once ``max_pending`` calls are queued, new work
+is refused with the pool's ``busy_error`` so callers can answer 503 instead
+of letting the queue grow without bound.
+
+Spawned workers import this module, so it stays free of heavy imports.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Type
+import asyncio
+import multiprocessing
+
+class WorkerPoolBusy(Exception):
+    pass
+
+class BoundedProcessPool:
+    def __init__(self, name: str, workers: int, max_pending: int, busy_error: Type[WorkerPoolBusy] = WorkerPoolBusy):
+        self.name = name
+        self.workers = workers
+        self.max_pending = max_pending
+        self.busy_error = busy_error
+        self.pending = 0
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _ensure_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn keeps workers from inheriting the server's threads, sockets and DB pool
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    async def run(self, fn, *args):
+        if self.pending >= self.max_pending:
+            raise self.busy_error(f"{self.pending} {self.name} jobs already queued")
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._ensure_executor(), fn, *args)
+        finally:
+            self.pending -= 1
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
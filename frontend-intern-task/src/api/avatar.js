@@ -0,0 +1,10 @@
+// Pick the smallest WebP thumbnail covering `size` pixels; older uploads only have the original
+export const avatarSrc = (user, size) => {
+    const variants = user?.avatar_urls || {};
+    const fittingSize = Object.keys(variants)
+        .map(Number)
+        .sort((a, b) => a - b)
+        .find(variantSize => variantSize >= size);
+    const path = fittingSize ? variants[fittingSize] : user?.avatar_url;
+    return path ? `http://localhost:8000${path}` : null;
+};
@@ -40,10 +40,53 @@ const ChatAssistant = () => {
         setIsLoading(true);
 
         try {
-            const response = await api.post('/chat/ask', { message: userMsg });
-            setMessages(prev => [...prev, { role: 'assistant', content: response.data.response }]);
+            // Stream the reply token by token instead of waiting for the full completion
+            const response = await fetch(`${api.defaults.baseURL}/chat/ask/stream`, {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                    Authorization: `Bearer ${localStorage.getItem('token')}`,
+                },
+                body: JSON.stringify({ message: userMsg }),
+            });
+            if (!response.ok || !response.body) throw new Error(`HTTP ${response.status}`);
+
+            setMessages(prev => [...prev, { role: 'assistant', content: '' }]);
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffered = '';
+            let streamFailed = false;
+
+            while (true) {
+                const { done, value } = await reader.read();
+                if (done) break;
+                buffered += decoder.decode(value, { stream: true });
+                const events = buffered.split('\n\n');
+                buffered = events.pop();
+
+                for (const rawEvent of events) {
+                    if (rawEvent.startsWith('event: error')) {
+                        streamFailed = true;
+                        continue;
+                    }
+                    const dataLine = rawEvent.split('\n').find(line => line.startsWith('data: '));
+                    if (!dataLine || dataLine === 'data: [DONE]') continue;
+                    const { delta } = JSON.parse(dataLine.slice(6));
+                    setMessages(prev => {
+                        const updated = [...prev];
+                        const last = updated[updated.length - 1];
+                        updated[updated.length - 1] = { ...last, content: last.content + delta };
+                        return updated;
+                    });
+                }
+            }
+            if (streamFailed) throw new Error('Assistant stream failed');
         } catch (error) {
-            setMessages(prev => [...prev, { role: 'assistant', content: 'Sorry, I encountered an error. Please try again later.' }]);
+            setMessages(prev => {
+                const last = prev[prev.length - 1];
+                const withoutEmpty = last?.role === 'assistant' && !last.content ? prev.slice(0, -1) : prev;
+                return [...withoutEmpty, { role: 'assistant', content: 'Sorry, I encountered an error. Please try again later.' }];
+            });
         } finally {
             setIsLoading(false);
         }
@@ -2,6 +2,7 @@ import React, { useContext, useState } from 'react';
 import { Link, useNavigate } from 'react-router-dom';
 import AuthContext from '../context/AuthContext';
 import Button from './Button';
+import { avatarSrc } from '../api/avatar';
 import { Menu, X } from 'lucide-react';
 
 const Navbar = () => {
@@ -30,7 +31,7 @@ const Navbar = () => {
                                 <div className="flex items-center gap-3">
                                     {user?.avatar_url ? (
                                         <img
-                                            src={`http://localhost:8000${user.avatar_url}`}
+                                            src={avatarSrc(user, 64)}
                                             alt="Profile"
                                             className="w-8 h-8 rounded-full object-cover border border-primary/30"
                                         />
@@ -68,7 +69,7 @@ const Navbar = () => {
                                 <div className="flex items-center gap-3 pb-4 border-b border-white/10">
                                     {user?.avatar_url ? (
                                         <img
-                                            src={`http://localhost:8000${user.avatar_url}`}
+                                            src={avatarSrc(user, 80)}
                                             alt="Profile"
                                             className="w-10 h-10 rounded-full object-cover border border-primary/30"
                                         />
@@ -2,6 +2,7 @@ import React, { useState, useEffect, useContext } from 'react';
 import { useNavigate, Link } from 'react-router-dom';
 import AuthContext from '../context/AuthContext';
 import api from '../api/axios';
+import { avatarSrc } from '../api/avatar';
 import { BarChart3, TrendingUp, Clock, Target, Brain, ArrowLeft, CheckCircle2, Zap } from 'lucide-react';
 import toast from 'react-hot-toast';
 
@@ -15,6 +16,32 @@ const Analytics = () => {
         retrieveAnalyticsData();
     }, []);
 
+    useEffect(() => {
+        if (!user) return;
+
+        // AI insights are generated in the background and pushed here when ready
+        const apiBase = import.meta.env.VITE_API_URL || 'http://localhost:8000';
+        const token = localStorage.getItem('token');
+        const wsUrl = apiBase.replace(/^http/, 'ws') + `/ws/${user.username || 'anon'}?token=${encodeURIComponent(token || '')}`;
+        const socket = new WebSocket(wsUrl);
+
+        socket.onmessage = (event) => {
+            let payload;
+            try {
+                payload = JSON.parse(event.data);
+            } catch (err) {
+                return;
+            }
+            if (payload.event === 'insights_update') {
+                setAnalyticsData(prevData => prevData ? { ...prevData, ai_insights: payload.ai_insights } : prevData);
+            }
+        };
+
+        return () => {
+            socket.close();
+        };
+    }, [user]);
+
     const retrieveAnalyticsData = async () => {
         try {
             const result = await api.get('/analytics/');
@@ -68,7 +95,7 @@ const Analytics = () => {
                     <div className="flex items-center gap-3 flex-shrink-0">
                         {user?.avatar_url ? (
                             <img
-                                src={`http://localhost:8000${user.avatar_url}`}
+                                src={avatarSrc(user, 80)}
                                 alt="Profile"
                                 className="w-8 md:w-10 h-8 md:h-10 rounded-full object-cover border-2 border-primary/30"
                             />
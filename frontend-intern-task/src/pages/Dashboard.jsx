@@ -1,6 +1,7 @@
-import React, { useState, useEffect, useContext } from 'react';
+import React, { useState, useEffect, useContext, useRef } from 'react';
 import AuthContext from '../context/AuthContext';
 import api from '../api/axios';
+import { avatarSrc } from '../api/avatar';
 import Button from '../components/Button';
 import { Plus, Trash2, Search, X, LayoutDashboard, Settings, LogOut, CheckCircle2, Clock, AlertCircle, BarChart3, Calendar, Menu } from 'lucide-react';
 import { useForm } from 'react-hook-form';
@@ -11,9 +12,15 @@ import DatePicker from 'react-datepicker';
 import 'react-datepicker/dist/react-datepicker.css';
 import ChatAssistant from '../components/ChatAssistant';
 
+const PAGE_SIZE = 50;
+const MAX_PAGE_SIZE = 500;
+
 const Dashboard = () => {
     const { user, logout } = useContext(AuthContext);
     const [taskList, setTaskList] = useState([]);
+    const [nextCursor, setNextCursor] = useState(null);
+    const [isLoadingMore, setLoadingMore] = useState(false);
+    const [taskSummary, setTaskSummary] = useState({ total: 0, completed: 0, in_progress: 0, pending: 0 });
     const [isTaskModalVisible, setTaskModalVisible] = useState(false);
     const [searchTerm, setSearchTerm] = useState('');
     const { register, handleSubmit, reset, setValue, formState: { errors } } = useForm();
@@ -23,8 +30,18 @@ const Dashboard = () => {
     const [dateSelection, setDateSelection] = useState(null);
     const [isSidebarActive, setSidebarActive] = useState(false);
     const navigate = useNavigate();
+    // Realtime deltas arrive in a handler bound once per socket, so it reads the filters through a ref
+    const activeFilters = useRef();
+    activeFilters.current = { status: currentFilter, titlePrefix: searchTerm.trim() };
+    const latestListRequest = useRef(0);
+
+    useEffect(() => { loadTaskSummary(); }, []);
 
-    useEffect(() => { loadTaskData(); }, []);
+    // Filters are applied by the server; wait for typing to pause before asking it
+    useEffect(() => {
+        const debounceTimer = setTimeout(() => { loadTaskData(); }, 300);
+        return () => clearTimeout(debounceTimer);
+    }, [currentFilter, searchTerm]);
 
     useEffect(() => {
         if (!user) return;
@@ -34,7 +51,8 @@ const Dashboard = () => {
         const wsProtocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
         // Construct WS URL from VITE_API_URL or fallback to localhost:8000
         const apiBase = import.meta.env.VITE_API_URL || 'http://localhost:8000';
-        const wsUrl = apiBase.replace(/^http/, 'ws') + `/ws/${user.username || 'anon'}`;
+        const token = localStorage.getItem('token');
+        const wsUrl = apiBase.replace(/^http/, 'ws') + `/ws/${user.username || 'anon'}?token=${encodeURIComponent(token || '')}`;
 
         const socket = new WebSocket(wsUrl);
 
@@ -43,9 +61,19 @@ const Dashboard = () => {
         };
 
         socket.onmessage = (event) => {
-            if (event.data === 'task_update') {
-                loadTaskData();
+            let delta;
+            try {
+                delta = JSON.parse(event.data);
+            } catch (err) {
+                return;
+            }
+            if (delta.event === 'task_update') {
+                applyTaskDelta(delta);
+                loadTaskSummary();
                 // Optional: toast('Dashboard updated', { icon: '🔄' });
+            } else if (delta.event === 'task_batch_update') {
+                applyTaskBatch(delta);
+                loadTaskSummary();
             }
         };
 
@@ -63,19 +91,84 @@ const Dashboard = () => {
         if (finishedItems.length > 0) {
             const cleanupTimer = setTimeout(async () => {
                 toast('Completed tasks removed from view', { icon: '✨' });
-                await loadTaskData();
+                // Reload as many tasks as are shown, so pages loaded with "Load more" stay
+                await loadTaskData(Math.min(MAX_PAGE_SIZE, Math.max(PAGE_SIZE, taskList.length)));
             }, 3000);
             return () => clearTimeout(cleanupTimer);
         }
     }, [taskList]);
 
-    const loadTaskData = async () => {
+    const taskFilterParams = () => {
+        const { status, titlePrefix } = activeFilters.current;
+        return {
+            ...(status !== 'all' ? { status } : {}),
+            ...(titlePrefix ? { title_prefix: titlePrefix } : {}),
+        };
+    };
+
+    const matchesActiveFilters = (task) => {
+        const { status, titlePrefix } = activeFilters.current;
+        return (status === 'all' || task.status === status) &&
+            task.title.toLowerCase().startsWith(titlePrefix.toLowerCase());
+    };
+
+    // First page only; further pages are fetched on demand with the X-Next-Cursor header
+    const loadTaskData = async (limit = PAGE_SIZE) => {
+        const requestId = ++latestListRequest.current;
         try {
-            const result = await api.get('/tasks/');
+            const result = await api.get('/tasks/', { params: { limit, ...taskFilterParams() } });
+            // A slower response for filters the user has since changed must not overwrite a newer one
+            if (requestId !== latestListRequest.current) return;
             setTaskList(result.data);
+            setNextCursor(result.headers['x-next-cursor'] || null);
         } catch (err) { console.error("Failed to fetch tasks", err); }
     };
 
+    const loadMoreTasks = async () => {
+        const requestId = latestListRequest.current;
+        setLoadingMore(true);
+        try {
+            const result = await api.get('/tasks/', { params: { limit: PAGE_SIZE, cursor: nextCursor, ...taskFilterParams() } });
+            if (requestId !== latestListRequest.current) return;
+            // Tasks created since the first page was loaded were already appended by their delta
+            setTaskList(prevTasks => {
+                const listedIds = new Set(prevTasks.map(t => t.id));
+                return [...prevTasks, ...result.data.filter(t => !listedIds.has(t.id))];
+            });
+            setNextCursor(result.headers['x-next-cursor'] || null);
+        } catch (err) {
+            toast.error("Failed to load more tasks");
+        } finally {
+            setLoadingMore(false);
+        }
+    };
+
+    const loadTaskSummary = async () => {
+        try {
+            const result = await api.get('/tasks/summary');
+            setTaskSummary(result.data);
+        } catch (err) { console.error("Failed to fetch task summary", err); }
+    };
+
+    // Patch local state from a server-pushed delta instead of re-fetching the whole list
+    const patchTaskList = (prevTasks, { action, task }) => {
+        if (action === 'deleted' || !matchesActiveFilters(task)) {
+            return prevTasks.filter(t => t.id !== task.id);
+        }
+        const alreadyListed = prevTasks.some(t => t.id === task.id);
+        return alreadyListed
+            ? prevTasks.map(t => t.id === task.id ? task : t)
+            : [...prevTasks, task];
+    };
+
+    const applyTaskDelta = (delta) => {
+        setTaskList(prevTasks => patchTaskList(prevTasks, delta));
+    };
+
+    const applyTaskBatch = ({ changes }) => {
+        setTaskList(prevTasks => changes.reduce(patchTaskList, prevTasks));
+    };
+
     const handleTaskCreation = async (formData) => {
         try {
             const payload = {
@@ -83,7 +176,8 @@ const Dashboard = () => {
                 due_date: formData.due_date ? new Date(formData.due_date).toISOString() : null
             };
             const result = await api.post('/tasks/', payload);
-            setTaskList([...taskList, result.data]);
+            applyTaskDelta({ action: 'created', task: result.data });
+            loadTaskSummary();
             setTaskModalVisible(false);
             reset();
             setDateSelection(null);
@@ -97,7 +191,8 @@ const Dashboard = () => {
         const { taskId } = deletePrompt;
         try {
             await api.delete(`/tasks/${taskId}`);
-            setTaskList(taskList.filter(t => t.id !== taskId));
+            applyTaskDelta({ action: 'deleted', task: { id: taskId } });
+            loadTaskSummary();
             toast.success("Task deleted");
         } catch (err) {
             toast.error("Failed to delete");
@@ -110,20 +205,14 @@ const Dashboard = () => {
         const updatedStatus = targetTask.status === 'completed' ? 'pending' : 'completed';
         try {
             const result = await api.put(`/tasks/${targetTask.id}`, { status: updatedStatus });
-            setTaskList(taskList.map(t => t.id === targetTask.id ? result.data : t));
+            applyTaskDelta({ action: 'updated', task: result.data });
+            loadTaskSummary();
             toast.success(`Task marked as ${updatedStatus}`);
         } catch (err) {
             toast.error("Failed to update task");
         }
     };
 
-    const displayTasks = taskList.filter(t => {
-        const searchMatch = t.title.toLowerCase().includes(searchTerm.toLowerCase()) ||
-            t.description.toLowerCase().includes(searchTerm.toLowerCase());
-        const statusMatch = currentFilter === 'all' || t.status === currentFilter;
-        return searchMatch && statusMatch;
-    });
-
     const retrieveStatusColor = (statusVal) => {
         switch (statusVal) {
             case 'completed': return 'text-neon-green';
@@ -171,7 +260,7 @@ const Dashboard = () => {
                     <div className="flex items-center gap-3 mb-4">
                         {user?.avatar_url ? (
                             <img
-                                src={`http://localhost:8000${user.avatar_url}`}
+                                src={avatarSrc(user, 80)}
                                 alt="Profile"
                                 className="w-10 h-10 rounded-full object-cover border-2 border-primary/30"
                             />
@@ -205,7 +294,7 @@ const Dashboard = () => {
                                 <Search className="absolute left-3 top-2.5 text-gray-500 w-4 h-4" />
                                 <input
                                     type="text"
-                                    placeholder="Search tasks..."
+                                    placeholder="Search by title..."
                                     className="bg-black/50 border border-white/10 rounded-full pl-10 pr-4 py-2 text-sm focus:border-primary outline-none focus:ring-1 focus:ring-primary/50 w-full md:w-64 transition-all"
                                     value={searchTerm}
                                     onChange={(e) => setSearchTerm(e.target.value)}
@@ -236,7 +325,7 @@ const Dashboard = () => {
                         <div className="relative z-10 flex flex-col md:flex-row items-center md:items-center gap-4 md:gap-6">
                             {user?.avatar_url ? (
                                 <img
-                                    src={`http://localhost:8000${user.avatar_url}`}
+                                    src={avatarSrc(user, 160)}
                                     alt="Profile"
                                     className="w-16 md:w-20 h-16 md:h-20 rounded-full object-cover border-2 border-primary/30 flex-shrink-0"
                                 />
@@ -261,7 +350,7 @@ const Dashboard = () => {
                         <div className="bg-dark-card border border-white/5 p-4 md:p-6 rounded-xl relative overflow-hidden">
                             <div className="relative z-10">
                                 <div className="text-gray-400 text-xs md:text-sm">Total Tasks</div>
-                                <div className="text-2xl md:text-3xl font-bold mt-1">{taskList.length}</div>
+                                <div className="text-2xl md:text-3xl font-bold mt-1">{taskSummary.total}</div>
                             </div>
                             <div className="absolute right-0 bottom-0 opacity-10 text-primary transform translate-x-4 translate-y-4">
                                 <LayoutDashboard size={80} />
@@ -271,7 +360,7 @@ const Dashboard = () => {
                             <div className="relative z-10">
                                 <div className="text-gray-400 text-xs md:text-sm">Completed</div>
                                 <div className="text-2xl md:text-3xl font-bold mt-1 text-neon-green">
-                                    {taskList.filter(t => t.status === 'completed').length}
+                                    {taskSummary.completed}
                                 </div>
                             </div>
                             <div className="absolute right-0 bottom-0 opacity-10 text-neon-green transform translate-x-4 translate-y-4">
@@ -282,7 +371,7 @@ const Dashboard = () => {
                             <div className="relative z-10">
                                 <div className="text-gray-400 text-xs md:text-sm">Pending</div>
                                 <div className="text-2xl md:text-3xl font-bold mt-1 text-primary">
-                                    {taskList.filter(t => t.status === 'pending').length}
+                                    {taskSummary.pending}
                                 </div>
                             </div>
                             <div className="absolute right-0 bottom-0 opacity-10 text-primary transform translate-x-4 translate-y-4">
@@ -292,7 +381,7 @@ const Dashboard = () => {
                     </div>
 
                     <div className="grid grid-cols-1 lg:grid-cols-2 xl:grid-cols-3 gap-4 md:gap-6">
-                        {displayTasks.map(item => (
+                        {taskList.map(item => (
                             <div key={item.id} className="bg-dark-card/50 backdrop-blur-sm border border-white/5 rounded-xl p-4 md:p-6 hover:border-primary/30 transition-all duration-300 group">
                                 <div className="flex justify-between items-start mb-4 gap-2">
                                     <div className="flex items-start gap-2 md:gap-3 flex-1">
@@ -361,7 +450,15 @@ const Dashboard = () => {
                         ))}
                     </div>
 
-                    {displayTasks.length === 0 && (
+                    {nextCursor && (
+                        <div className="flex justify-center mt-8">
+                            <Button variant="outline" onClick={loadMoreTasks} disabled={isLoadingMore}>
+                                {isLoadingMore ? 'Loading...' : 'Load more'}
+                            </Button>
+                        </div>
+                    )}
+
+                    {taskList.length === 0 && (
                         <div className="text-center py-16">
                             <AlertCircle size={48} className="mx-auto text-gray-600 mb-4" />
                             <p className="text-gray-400">No tasks found. Create your first task to get started!</p>
@@ -465,7 +562,8 @@ const Dashboard = () => {
                     try {
                         const nextState = actionPrompt.type === 'start' ? 'in_progress' : 'completed';
                         const response = await api.put(`/tasks/${actionPrompt.item.id}`, { status: nextState });
-                        setTaskList(taskList.map(t => t.id === actionPrompt.item.id ? response.data : t));
+                        applyTaskDelta({ action: 'updated', task: response.data });
+                        loadTaskSummary();
                         toast.success(actionPrompt.type === 'start' ? 'Task started! ⏱️' : 'Task completed! 🎉');
                         setActionPrompt({ visible: false, type: null, item: null });
                     } catch (err) {
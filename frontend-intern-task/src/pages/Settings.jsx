@@ -2,6 +2,7 @@ import React, { useState, useContext, useEffect, useRef } from 'react';
 import { useNavigate } from 'react-router-dom';
 import AuthContext from '../context/AuthContext';
 import api from '../api/axios';
+import { avatarSrc } from '../api/avatar';
 import Button from '../components/Button';
 import Navbar from '../components/Navbar';
 import { User, Phone, FileText, Save, ArrowLeft, Camera } from 'lucide-react';
@@ -27,7 +28,7 @@ const Settings = () => {
                     phone: result.data.phone || '',
                 });
                 if (result.data.avatar_url) {
-                    setImagePreview(`http://localhost:8000${result.data.avatar_url}`);
+                    setImagePreview(avatarSrc(result.data, 192));
                 }
             } catch (err) {
                 console.error('Failed to fetch profile', err);
@@ -71,7 +72,7 @@ const Settings = () => {
 
         setIsUploading(true);
         const uploadData = new FormData();
-        uploadData.append('file', selectedFile);
+        uploadData.append('image_file', selectedFile);
 
         try {
             const result = await api.post('/profile/avatar', uploadData, {